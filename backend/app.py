@@ -4,22 +4,66 @@ import firebase_admin
 from firebase_admin import credentials
 from routes.user_routes import user_routes
 from routes.match_routes import match_routes
+from routes.metrics_routes import metrics_routes
+from services import metrics, tracing
+from services.firebase_service import db
+from services.user_replica import USER_REPLICA_ENABLED, user_replica
 import os
 import logging
 logging.basicConfig(level=logging.INFO)
 
-def create_app(testing: bool = False):
+SERVING_MODES = ("sync", "async")
+
+def create_app(testing: bool = False, serving_mode: str = None):
+    """
+    Builds the app. `serving_mode` (default: SERVING_MODE env, else "sync"):
+      - "sync": each request holds a worker thread while it waits on
+        Firestore or Expo (gunicorn gthread workers).
+      - "async": requests run as gevent greenlets that yield while waiting,
+        so independent calls overlap and one process serves hundreds of
+        in-flight requests and open chat streams (gunicorn gevent workers).
+    """
+    serving_mode = (serving_mode or os.getenv("SERVING_MODE", "sync")).lower()
+    if serving_mode not in SERVING_MODES:
+        raise ValueError(f"Unknown SERVING_MODE: {serving_mode}")
+    if serving_mode == "async":
+        enable_cooperative_io()
+
     app = Flask(__name__)
     app.config['TESTING'] = testing
+    app.config['SERVING_MODE'] = serving_mode
 
     # Allow any origin (full access)
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
     setup_firebase()
+    metrics.init_app(app)
+    metrics.instrument_firestore(db)
+    tracing.init_app(app)
+    if USER_REPLICA_ENABLED:
+        # One listener per worker process; loads every user once, then streams changes
+        user_replica.start(db.collection("users"), db.collection("likes"))
     register_routes(app)
 
     return app
 
+def enable_cooperative_io():
+    """
+    Makes gRPC (Firestore) cooperate with gevent. The standard library,
+    and with it `requests`, is patched by gunicorn's gevent worker before
+    the app is imported; gunicorn.conf.py picks that worker in async mode.
+    Needs the `gevent` package.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise RuntimeError("SERVING_MODE=async needs the gevent package")
+    if not monkey.is_module_patched("socket"):
+        raise RuntimeError("SERVING_MODE=async must run under gevent workers (see gunicorn.conf.py)")
+
+    import grpc.experimental.gevent as grpc_gevent
+    grpc_gevent.init_gevent()
+
 def setup_firebase():
     firebase_credentials_path = os.getenv("FIREBASE_CREDENTIALS")
     if firebase_credentials_path:
@@ -34,6 +78,7 @@ def setup_firebase():
 def register_routes(app):
     app.register_blueprint(user_routes, url_prefix="/api")
     app.register_blueprint(match_routes, url_prefix="/api")
+    app.register_blueprint(metrics_routes)
 
     @app.route("/")
     def home():
@@ -0,0 +1,123 @@
+"""
+Compares the original per-document filter loop from /suggested_users with
+the bitset-backed SuggestionIndex on synthetic users.
+
+Run from backend/:
+    python -m benchmarks.bench_suggestion_filters            # 10k, 100k, 1M users
+    python -m benchmarks.bench_suggestion_filters 10000 50000
+"""
+import itertools
+import random
+import sys
+import time
+
+from services.suggestion_index import SuggestionIndex
+
+MAJORS = [f"Major {i}" for i in range(80)]
+CAREERS = [f"Career {i}" for i in range(40)]
+HOBBIES = [f"Hobby {i}" for i in range(150)]
+ORGS = [f"Org {i}" for i in range(400)]
+INDUSTRIES = [f"Industry {i}" for i in range(30)]
+AREAS = [f"Area {i}" for i in range(25)]
+
+# (filter name, filter dict) pairs shaped like what the swipe tab sends
+FILTERS = [
+    ("no filters", {}),
+    ("userType", {"userType": "mentor"}),
+    ("major + gradYear", {"major": "Major 0", "gradYear": 2026}),
+    ("hobbies any-of", {"hobbies": ["Hobby 0", "Hobby 1", "Hobby 2"]}),
+    ("mixed", {
+        "userType": "mentor",
+        "interestedIndustries": ["Industry 0", "Industry 3"],
+        "hobbies": ["Hobby 0", "Hobby 5"],
+    }),
+]
+
+
+_CUM_WEIGHTS = {}
+
+
+def _skewed(rng, values, k):
+    """Picks up to k distinct values with a long-tailed (roughly Zipf) popularity."""
+    cum_weights = _CUM_WEIGHTS.get(id(values))
+    if cum_weights is None:
+        cum_weights = _CUM_WEIGHTS[id(values)] = list(
+            itertools.accumulate(1 / (rank + 1) for rank in range(len(values)))
+        )
+    return list(dict.fromkeys(rng.choices(values, cum_weights=cum_weights, k=k)))
+
+
+def synthetic_users(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield f"user_{i:07d}", {
+            "profile": {
+                "major": _skewed(rng, MAJORS, 1)[0],
+                "gradYear": rng.randint(2024, 2029),
+                "userType": rng.choice(["mentor", "mentee", "mentee"]),
+                "careerPath": _skewed(rng, CAREERS, 1)[0],
+                "hobbies": _skewed(rng, HOBBIES, rng.randint(1, 5)),
+                "orgs": _skewed(rng, ORGS, rng.randint(0, 3)),
+                "interestedIndustries": _skewed(rng, INDUSTRIES, rng.randint(1, 3)),
+                "mentorshipAreas": _skewed(rng, AREAS, rng.randint(0, 3)),
+            }
+        }
+
+
+def legacy_filter(docs, raw_filters):
+    """The per-document loop /suggested_users used before the index."""
+    matched = []
+    for uid, d in docs:
+        profile = d.get("profile", {})
+        match = True
+        for key, value in raw_filters.items():
+            if isinstance(value, str) and value:
+                if profile.get(key) != value:
+                    match = False
+                    break
+            elif isinstance(value, int):
+                if profile.get(key) != value:
+                    match = False
+                    break
+            elif isinstance(value, list) and value:
+                target = profile.get(key, [])
+                if not any(item in target for item in value):
+                    match = False
+                    break
+        if match:
+            matched.append(uid)
+    return matched
+
+
+def _best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(count):
+    docs = list(synthetic_users(count))
+    index = SuggestionIndex()
+    start = time.perf_counter()
+    index.rebuild(docs)
+    build = time.perf_counter() - start
+    print(f"\n{count:,} users (index build {build * 1000:.0f} ms)")
+    print(f"  {'filter':<18}{'matches':>10}{'loop ms':>12}{'bitset ms':>12}{'speedup':>10}")
+
+    for name, raw_filters in FILTERS:
+        loop_s, expected = _best_of(lambda: legacy_filter(docs, raw_filters))
+        index_s, got = _best_of(lambda: index.match_ids(raw_filters))
+        assert set(got) == set(expected), f"result mismatch for {name}"
+        print(
+            f"  {name:<18}{len(got):>10,}{loop_s * 1000:>12.1f}"
+            f"{index_s * 1000:>12.1f}{loop_s / max(index_s, 1e-9):>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,324 @@
+"""
+Drives every API route concurrently against the in-memory Firestore from
+tests/mock_firebase.py and reports per-route latency percentiles and
+Firestore round trips per request.
+
+The mock adds a fixed latency to every RPC (and optionally per document
+read), so the numbers reflect how many round trips a route makes and how
+many of them overlap, not Firestore's real speed. Push notifications are
+dropped instead of being sent to Expo.
+
+Run from backend/:
+    python -m benchmarks.load_test                      # 1k and 10k users
+    python -m benchmarks.load_test --users 1000000 --requests 20000
+    python -m benchmarks.load_test --latency-ms 8 --threads 64
+    python -m benchmarks.load_test --replica            # with the user replica
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+import mock_firebase  # noqa: E402
+
+# The app binds its Firestore client at import, so the mock goes in first
+mock_firebase.install()
+
+from app import create_app  # noqa: E402
+from benchmarks.bench_suggestion_filters import synthetic_users  # noqa: E402
+from services import metrics  # noqa: E402
+from services.firebase_service import LIKES_COLLECTION, email_reservation, get_convo_id, like_ref  # noqa: E402
+from services.push_queue import push_queue  # noqa: E402
+from services.user_replica import user_replica  # noqa: E402
+
+logging.disable(logging.INFO)
+
+LIKES_PER_USER = 20
+MATCHES_PER_USER = 3
+MESSAGES_PER_CONVERSATION = 10
+
+# Fields the edit routes require in full
+PROFILE_FIELDS = ("bio", "profilePictureUrl", "major", "gradYear", "hobbies", "orgs", "careerPath",
+                  "interestedIndustries", "userType", "mentorshipAreas")
+SETTINGS_FIELDS = ("firstName", "lastName", "email", "birthday", "ethnicity", "gender", "pronouns")
+
+# (name, weight) of each scenario; every route appears in at least one
+MIX = [
+    ("suggested_users", 20),
+    ("suggested_users_ranked", 10),
+    ("swipe", 25),
+    ("matches", 10),
+    ("liked_me", 5),
+    ("conversation", 10),
+    ("conversation_stream", 2),
+    ("message", 10),
+    ("profile", 8),
+    ("update_profile", 3),
+    ("update_settings", 2),
+    ("set_notification_token", 2),
+    ("delete_match", 1),
+    ("signup_and_delete", 1),
+]
+
+
+def _store(collection, doc_id, data):
+    """Writes straight into the mock, skipping RPC accounting and latency."""
+    doc = collection.document(doc_id)
+    doc._write(data)
+    return doc
+
+
+def seed(count, rng):
+    """Fills the mock with `count` users, their likes, matches and conversations."""
+    db = mock_firebase.mock_db
+    db.reset()
+    users, emails, conversations = db.collection("users"), db.collection("emails"), db.collection("conversations")
+    likes = db.collection(LIKES_COLLECTION)
+    ids = []
+    for uid, data in synthetic_users(count):
+        email = f"{uid}@rutgers.edu"
+        data.update({
+            "uid": uid,
+            "settings": {"firstName": uid, "lastName": "Load", "email": email},
+            "notification_token": f"ExponentPushToken[{uid}]",
+            "matched_users": [],
+        })
+        _store(users, uid, data)
+        _store(emails, email_reservation(email).id, {"uid": uid})
+        ids.append(uid)
+
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def like(liker, likee, matched=False):
+        _store(likes, like_ref(liker, likee).id, {
+            "liker": liker, "likee": likee, "matched": matched,
+            "createdAt": start - timedelta(seconds=rng.randrange(86400 * 30)),
+        })
+
+    for uid in ids:
+        for other in rng.sample(ids, min(LIKES_PER_USER, count - 1)):
+            if other != uid:
+                like(uid, other)
+
+    # Pair users off into mutual matches, each with a short conversation
+    for _ in range(count * MATCHES_PER_USER // 2):
+        a, b = rng.sample(ids, 2)
+        a_data, b_data = users.document(a).to_dict(), users.document(b).to_dict()
+        if b in a_data["matched_users"]:
+            continue
+        like(a, b, matched=True)
+        like(b, a, matched=True)
+        a_data["matched_users"].append(b)
+        b_data["matched_users"].append(a)
+        convo = _store(conversations, get_convo_id(a, b), {"participants": [a, b], "lastMessage": None})
+        messages = convo.collection("messages")
+        for i in range(MESSAGES_PER_CONVERSATION):
+            _store(messages, f"m{i}", {"text": f"hello {i}", "sender_id": (a, b)[i % 2],
+                                       "timestamp": start + timedelta(seconds=i)})
+    db.reset_stats()
+    return ids
+
+
+class Driver:
+    """Picks an actor for each scenario and issues its request(s)."""
+
+    def __init__(self, app, ids, seed):
+        self.app = app
+        self.ids = ids
+        self.rng = random.Random(seed)
+        self.client = app.test_client()
+        self.signups = 0
+
+    def _as(self, uid):
+        return {"Authorization": f"Bearer {uid}"}
+
+    def _stored(self, uid):
+        return mock_firebase.mock_db.collection("users").document(uid).to_dict()
+
+    def _actor(self):
+        return self.rng.choice(self.ids)
+
+    def _matched_pair(self):
+        for _ in range(20):
+            uid = self._actor()
+            matches = self._stored(uid).get("matched_users") or []
+            if matches:
+                return uid, self.rng.choice(matches)
+        return None, None
+
+    def _filters(self):
+        profile = self._stored(self._actor())["profile"]
+        return self.rng.choice([{}, {"userType": profile["userType"]}, {"hobbies": profile["hobbies"][:2]}])
+
+    def run(self, scenario):
+        """Yields (route, response) for each request the scenario made."""
+        uid = self._actor()
+        if scenario == "suggested_users":
+            yield "POST /suggested_users", self.client.post(
+                "/api/suggested_users", json={"limit": 20, **self._filters()}, headers=self._as(uid))
+        elif scenario == "suggested_users_ranked":
+            yield "POST /suggested_users (ranked)", self.client.post(
+                "/api/suggested_users", json={"limit": 20, "rank": True}, headers=self._as(uid))
+        elif scenario == "swipe":
+            target = self._actor()
+            if target != uid:
+                yield "POST /swipe", self.client.post("/api/swipe", json={"swipedID": target}, headers=self._as(uid))
+        elif scenario == "matches":
+            yield "GET /matches", self.client.get("/api/matches", headers=self._as(uid))
+        elif scenario == "liked_me":
+            yield "GET /liked_me", self.client.get("/api/liked_me", headers=self._as(uid))
+        elif scenario == "profile":
+            yield "GET /profile", self.client.get("/api/profile", headers=self._as(uid))
+        elif scenario == "update_profile":
+            profile = {field: None for field in PROFILE_FIELDS} | self._stored(uid)["profile"]
+            yield "PUT /update_profile", self.client.put(
+                "/api/update_profile", json={**profile, "bio": f"bio {self.rng.random()}"}, headers=self._as(uid))
+        elif scenario == "update_settings":
+            settings = {field: None for field in SETTINGS_FIELDS} | self._stored(uid)["settings"]
+            yield "PUT /update_settings", self.client.put(
+                "/api/update_settings", json={**settings, "pronouns": self.rng.choice(["She/Her", "They/Them"])},
+                headers=self._as(uid))
+        elif scenario == "set_notification_token":
+            yield "POST /set_notification_token", self.client.post(
+                "/api/set_notification_token", json={"userID": uid, "token": f"ExponentPushToken[{uid}]"},
+                headers=self._as(uid))
+        elif scenario == "signup_and_delete":
+            self.signups += 1
+            email = f"load{id(self)}-{self.signups}@rutgers.edu"
+            created = self.client.post("/api/create_user", json={"email": email, "password": "LoadTest123!"})
+            yield "POST /create_user", created
+            new_uid = (created.get_json() or {}).get("user_id")
+            if new_uid:
+                yield "DELETE /delete_account", self.client.delete("/api/delete_account", headers=self._as(new_uid))
+        else:
+            uid, target = self._matched_pair()
+            if uid is None:
+                return
+            if scenario == "conversation":
+                yield "GET /conversation", self.client.get(
+                    "/api/conversation", query_string={"targetID": target, "limit": 20}, headers=self._as(uid))
+            elif scenario == "conversation_stream":
+                # Measured to the first event; the stream is then dropped
+                res = self.client.get("/api/conversation/stream", query_string={"targetID": target},
+                                      headers=self._as(uid))
+                next(iter(res.response), None)
+                res.close()
+                yield "GET /conversation/stream", res
+            elif scenario == "message":
+                yield "POST /message", self.client.post(
+                    "/api/message", json={"targetID": target, "message": "load test"}, headers=self._as(uid))
+            elif scenario == "delete_match":
+                yield "POST /delete_match", self.client.post(
+                    "/api/delete_match", json={"targetID": target}, headers=self._as(uid))
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(users, requests, threads, latency_ms, per_document_ms, seed_value, replica=False):
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+    ids = seed(users, rng)
+    print(f"\n{users:,} users seeded in {time.perf_counter() - started:.1f} s")
+
+    db = mock_firebase.mock_db
+    push_queue.enqueue = lambda message: None
+    app = create_app()
+    if replica:
+        user_replica.stop()
+        user_replica.start(db.collection("users"), db.collection("likes"))
+
+    # The request's own counters, read back on the thread that made the request
+    last_stats = threading.local()
+
+    @app.after_request
+    def _capture(response):
+        stats = metrics.current_stats()
+        last_stats.value = stats.as_dict() if stats else {}
+        return response
+
+    # Builds the suggestion index and warms the caches outside the timed run
+    Driver(app, ids, seed_value).run("suggested_users").__next__()
+    db.latency, db.latency_per_document = latency_ms / 1000, per_document_ms / 1000
+    db.reset_stats()
+
+    scenarios = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    plan = rng.choices(scenarios, weights=weights, k=requests)
+    results = defaultdict(list)  # route -> [(seconds, status, stats)]
+    lock = threading.Lock()
+    local = threading.local()
+
+    def issue(i, scenario):
+        if not hasattr(local, "driver"):
+            local.driver = Driver(app, ids, seed_value + i)
+        responses = local.driver.run(scenario)
+        while True:
+            start = time.perf_counter()
+            try:
+                route, response = next(responses)
+            except StopIteration:
+                return
+            elapsed = time.perf_counter() - start
+            with lock:
+                results[route].append((elapsed, response.status_code, getattr(last_stats, "value", {})))
+
+    started = time.perf_counter()
+    # The services print progress; keep it out of the report
+    with ThreadPoolExecutor(max_workers=threads) as pool, contextlib.redirect_stdout(io.StringIO()):
+        for future in [pool.submit(issue, i, scenario) for i, scenario in enumerate(plan)]:
+            future.result()
+    wall = time.perf_counter() - started
+    db.latency = db.latency_per_document = 0.0
+
+    total = sum(len(samples) for samples in results.values())
+    print(f"{total:,} requests on {threads} threads in {wall:.1f} s ({total / wall:,.0f} req/s), "
+          f"RPC latency {latency_ms} ms + {per_document_ms} ms/doc")
+    print(f"  {'route':<34}{'count':>7}{'4xx':>5}{'5xx':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'rpcs':>7}{'reads':>9}{'writes':>8}")
+    for route in sorted(results):
+        samples = results[route]
+        seconds = [s for s, _, _ in samples]
+        rejected = sum(1 for _, status, _ in samples if 400 <= status < 500)
+        errors = sum(1 for _, status, _ in samples if status >= 500)
+
+        def mean(field):
+            return statistics.fmean(stats.get(field, 0) for _, _, stats in samples)
+
+        print(f"  {route:<34}{len(samples):>7}{rejected:>5}{errors:>5}"
+              f"{_percentile(seconds, 50) * 1000:>9.1f}{_percentile(seconds, 95) * 1000:>9.1f}"
+              f"{_percentile(seconds, 99) * 1000:>9.1f}{mean('rpcs'):>7.1f}{mean('reads'):>9.1f}{mean('writes'):>8.1f}")
+    stats = db.stats()
+    print(f"  Firestore: {stats['rpcs']:,} RPCs ({stats['rpcs'] / total:.2f}/request), "
+          f"{stats['documentsRead']:,} documents read, {stats['documentsWritten']:,} written")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="added to every Firestore RPC")
+    parser.add_argument("--per-document-ms", type=float, default=0.0, help="added per document read")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--replica", action="store_true", help="serve reads from the user replica")
+    args = parser.parse_args(argv)
+    for users in args.users:
+        run(users, args.requests, args.threads, args.latency_ms, args.per_document_ms, args.seed, args.replica)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Picked up automatically when gunicorn is started from backend/:
+#     gunicorn app:app
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+
+# SERVING_MODE picks how a worker waits on Firestore and Expo (see
+# app.create_app):
+#   - sync (default): threaded workers. A long-lived /conversation/stream
+#     connection holds one thread rather than a whole sync worker process.
+#     Size threads to cover the expected open streams (see MAX_CHAT_STREAMS)
+#     plus regular traffic.
+#   - async: gevent workers. Each request is a greenlet, so a worker keeps
+#     up to worker_connections requests and streams in flight.
+serving_mode = os.getenv("SERVING_MODE", "sync").lower()
+if serving_mode == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+else:
+    worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+    threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# Streams send a heartbeat every 15 s, well inside this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
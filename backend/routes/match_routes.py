@@ -1,28 +1,167 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from firebase_admin import firestore
 from services.firebase_service import db
 
 from services.firebase_service import (
     get_convo_id,
     get_user_profile,
-    send_notification,
+    get_user_profiles,
+    invalidate_user_profile,
+    delete_conversation,
     update_user_profile,
     update_user_settings,
     delete_user_account,
-    create_user_in_firebase
+    create_user_in_firebase,
+    load_suggestion_index,
+    build_user_summary,
+    get_excluded_ids,
+    get_liked_by_ids,
+    pending_likes_of,
+    like_edge,
+    like_ref,
+    MATCH_CARD_FIELDS,
+    SUMMARY_FIELDS
 )
 from services.auth_service import verify_token
+from services.concurrency import gather
+from services.tracing import span
+from services.suggestion_index import ranking_preferences
+from services.push_queue import enqueue_notification
+from services.chat_events import broker, publish_message
+from services.suggestion_queue import get_queue_page, schedule_queue_refresh
+from services.user_replica import user_replica
+import base64
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timezone
 import logging
 logger = logging.getLogger(__name__)
 
 
 match_routes = Blueprint('match_routes', __name__)
 
+# Largest page /suggested_users returns when the client sends `limit`
+MAX_SUGGESTION_PAGE_SIZE = 100
+
+# Page size of /liked_me when the client sends no `limit`, and its cap
+LIKED_ME_PAGE_SIZE = 20
+MAX_LIKED_ME_PAGE_SIZE = 100
+
+# /conversation/stream: comment line sent when idle, so proxies keep the
+# connection open; streams end after CHAT_STREAM_MAX_SECONDS and the client
+# reconnects after CHAT_STREAM_RETRY_MS, which frees the worker thread.
+CHAT_STREAM_HEARTBEAT_SECONDS = 15
+CHAT_STREAM_MAX_SECONDS = 300
+CHAT_STREAM_RETRY_MS = 3000
+# Open streams allowed per process, so streams cannot take every worker thread
+MAX_CHAT_STREAMS = int(os.getenv("MAX_CHAT_STREAMS", "200"))
+
+
+def _encode_cursor(last_id, score=None, queue=False):
+    """Opaque pagination cursor: the last user ID (and score) returned, base64 encoded."""
+    position = {'after': last_id}
+    if score is not None:
+        position['score'] = score
+    if queue:
+        position['queue'] = True
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Returns the position a cursor points after; raises ValueError if malformed."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(position.get('after'), str):
+            raise ValueError
+        score = position.get('score')
+        if score is not None and (isinstance(score, bool) or not isinstance(score, (int, float))):
+            raise ValueError
+        return position
+    except Exception:
+        raise ValueError("Invalid 'cursor'")
+
+
+def _read_users(user_ids):
+    """
+    Summary fields of users, from the user replica when it is ready, else
+    read in batched calls. Returns {user_id: data} for those that exist.
+    """
+    if user_replica.ready:
+        found = {uid: user_replica.get(uid) for uid in user_ids}
+        return {uid: data for uid, data in found.items() if data is not None}
+    profiles = get_user_profiles(user_ids, SUMMARY_FIELDS)
+    return {uid: data for uid, data in zip(user_ids, profiles) if data is not None}
+
+
+def _filtered_page(index, user_id, raw_filters, limit, cursor):
+    """
+    One page of users passing every filter, ordered by user ID.
+    With no `limit`, every candidate is returned and there is no next page.
+    """
+    # Resolve filters and exclusions against the in-process index, then read
+    # only the survivors.
+    excluded = get_excluded_ids(user_id)
+    candidate_ids = index.match_ids(raw_filters, exclude=excluded)
+
+    # Read candidates in ID order until the page is full. Only a page worth
+    # of IDs is selected at a time, so the full candidate list is never sorted.
+    after = cursor.get('after', '')
+    suggested = []
+    while limit is None or len(suggested) < limit:
+        batch = heapq.nsmallest(
+            MAX_SUGGESTION_PAGE_SIZE if limit is None else limit - len(suggested),
+            (uid for uid in candidate_ids if uid > after)
+        )
+        if not batch:
+            break
+        found = _read_users(batch)
+        suggested.extend(build_user_summary(uid, found[uid]) for uid in batch if uid in found)
+        after = batch[-1]
+
+    has_more = limit is not None and any(uid > after for uid in candidate_ids)
+    return suggested, _encode_cursor(after) if has_more else None
+
+
+def _ranked_page(index, user_id, raw_filters, limit, cursor):
+    """
+    One page of users ranked by weighted overlap, best first.
+    Filters act as preferences rather than hard gates; fields the client
+    left empty fall back to the requester's own profile.
+    """
+    # The replica or a fresh read: the exclusions must reflect likes made on any worker
+    user_data = user_replica.get(user_id) if user_replica.ready else None
+    if user_data is None:
+        user_data = get_user_profile(user_id, fresh=True) or {}
+    preferences = ranking_preferences(user_data.get('profile', {}), raw_filters)
+    excluded = get_excluded_ids(user_id, user_data)
+    after = (cursor['score'], cursor['after']) if 'score' in cursor else None
+
+    # Users who already liked the requester rank higher; known from the replica without a read
+    ranked = index.rank(preferences, limit or len(index), after=after, exclude=excluded,
+                        boost=get_liked_by_ids(user_id))
+    found = _read_users([uid for uid, _, _ in ranked]) if ranked else {}
+
+    suggested = []
+    for uid, score, breakdown in ranked:
+        if uid in found:
+            summary = build_user_summary(uid, found[uid])
+            summary['score'] = score
+            summary['scoreBreakdown'] = breakdown
+            suggested.append(summary)
+
+    if limit is None or len(ranked) < limit:
+        return suggested, None
+    last_id, last_score, _ = ranked[-1]
+    return suggested, _encode_cursor(last_id, last_score)
+
+
 @match_routes.route('/suggested_users', methods=['POST'])
 def suggested_users():
     """
     POST /suggested_users
-    Returns a list of user summaries matching the provided filters.
+    Returns a page of user summaries matching the provided filters.
 
     Filters supported (any combination):
       - profile.major (string)
@@ -34,6 +173,21 @@ def suggested_users():
       - profile.userType (string)
       - profile.mentorshipAreas (list of strings)
 
+    Pagination:
+      - limit (int, optional): page size, capped at MAX_SUGGESTION_PAGE_SIZE.
+        Without it every matching user is returned in one response, as before
+        pagination existed.
+      - cursor (string, optional): `nextCursor` from the previous page
+
+    Ranking:
+      - rank (bool, optional): score users by weighted overlap on hobbies, orgs,
+        interestedIndustries, mentorshipAreas, major and gradYear instead of
+        requiring every filter to match. Summaries then carry `score` and
+        `scoreBreakdown`, best match first. Without any filters the page is
+        served from the user's precomputed suggestion queue when one is fresh
+        and still has users to show.
+
+    Results are ordered by user ID unless ranked. `nextCursor` is null on the last page.
     Only users who are not the requester and not already liked/matched are returned.
     """
     try:
@@ -44,6 +198,14 @@ def suggested_users():
         user_id = decoded_token['uid']
         data = request.get_json(silent=True) or {}
 
+        try:
+            limit = int(data['limit']) if data.get('limit') is not None else None
+            cursor = _decode_cursor(data['cursor']) if data.get('cursor') else {}
+        except (TypeError, ValueError):
+            return jsonify({'error': "Invalid 'limit' or 'cursor'"}), 400
+        if limit is not None:
+            limit = max(1, min(limit, MAX_SUGGESTION_PAGE_SIZE))
+
         # Build raw filters
         raw_filters = {
             'major': data.get('major', '').strip(),
@@ -56,69 +218,73 @@ def suggested_users():
             'mentorshipAreas': data.get('mentorshipAreas', []),
         }
 
-
-        # Retrieve all user docs
-        docs = db.collection('users').stream()
-        user_data = get_user_profile(user_id) or {}
-        suggested = []
-
-        # Iterate and filter in Python
-        for doc in docs:
-            uid = doc.id
-            # Skip self, liked, or matched
-            if uid == user_id:
-                continue
-            if uid in user_data.get('liked_users', {}) or uid in user_data.get('matched_users', []):
-                continue
-
-            d = doc.to_dict()
-            profile = d.get('profile', {})
-            settings = d.get('settings', {})
-
-            # Apply each filter; if any fail, skip this user
-            match = True
-            for key, value in raw_filters.items():
-                if isinstance(value, str) and value:
-                    if profile.get(key) != value:
-                        match = False
-                        break
-                elif isinstance(value, int):
-                    if profile.get(key) != value:
-                        match = False
-                        break
-                elif isinstance(value, list) and value:
-                    # require at least one overlap
-                    target = profile.get(key, [])
-                    if not any(item in target for item in value):
-                        match = False
-                        break
-            if not match:
-                continue
-
-            # Passed all filters; construct summary
-            suggested.append({
-                'id': uid,
-                'firstName': settings.get('firstName', 'Unknown'),
-                'lastName': settings.get('lastName', ''),
-                'ethnicity': settings.get('ethnicity', ''),
-                'gender': settings.get('gender', ''),
-                'pronouns': settings.get('pronouns', ''),
-                'bio': profile.get('bio', ''),
-                'major': profile.get('major', ''),
-                'gradYear': profile.get('gradYear', ''),
-                'hobbies': profile.get('hobbies', []),
-                'orgs': profile.get('orgs', []),
-                'careerPath': profile.get('careerPath', ''),
-                'interestedIndustries': profile.get('interestedIndustries', []),
-                'mentorshipAreas': profile.get('mentorshipAreas', []),
-            })
-
-        return jsonify({'users': suggested}), 200
+        # Unfiltered ranked decks come straight from the precomputed queue
+        if data.get('rank') and not any(raw_filters.values()) and (not cursor or cursor.get('queue')):
+            excluded = get_excluded_ids(user_id)
+            page = get_queue_page(user_id, limit, cursor.get('after'), exclude=excluded)
+            if page is not None:
+                suggested, last_id, has_more = page
+                next_cursor = _encode_cursor(last_id, queue=True) if has_more else None
+                return jsonify({'users': suggested, 'nextCursor': next_cursor}), 200
+            # Missing, expired or used up: rank live from the top and rebuild it
+            schedule_queue_refresh(user_id)
+            cursor = {}
+
+        index = load_suggestion_index()
+        if data.get('rank'):
+            suggested, next_cursor = _ranked_page(index, user_id, raw_filters, limit, cursor)
+        else:
+            suggested, next_cursor = _filtered_page(index, user_id, raw_filters, limit, cursor)
+
+        return jsonify({'users': suggested, 'nextCursor': next_cursor}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@firestore.transactional
+def _record_swipe(transaction, user_id, swiped_id):
+    """
+    Records user_id liking swiped_id as a like edge and, if the like is
+    mutual, creates the match and conversation, all in one transaction.
+
+    The mutual check is one batched point read of both like edges. Two users
+    swiping on each other at the same moment therefore conflict on those
+    reads, and the retried transaction sees the other like, so a match is
+    never missed. The swiped user's document is only read for a match.
+
+    Returns the swiped user's data if a match was created, else None.
+    """
+    users = db.collection('users')
+    user_ref = users.document(user_id)
+    swiped_ref = users.document(swiped_id)
+    like, liked_back = like_ref(user_id, swiped_id), like_ref(swiped_id, user_id)
+    edges = {doc.id: doc for doc in db.get_all([like, liked_back], transaction=transaction)}
+    is_new = not edges[like.id].exists
+
+    if not edges[liked_back.id].exists:
+        if is_new:
+            transaction.set(like, like_edge(user_id, swiped_id))
+        return None
+
+    swiped = swiped_ref.get(transaction=transaction)
+    swiped_data = swiped.to_dict() if swiped.exists else {}
+    # Both likes stop being pending
+    if is_new:
+        transaction.set(like, like_edge(user_id, swiped_id, matched=True))
+    else:
+        transaction.update(like, {'matched': True})
+    transaction.update(liked_back, {'matched': True})
+    transaction.update(user_ref, {'matched_users': firestore.ArrayUnion([swiped_id])})
+    transaction.update(swiped_ref, {'matched_users': firestore.ArrayUnion([user_id])})
+    transaction.set(db.collection('conversations').document(get_convo_id(user_id, swiped_id)), {
+        'participants': [user_id, swiped_id],
+        'lastMessage': None,
+        'lastUpdated': firestore.SERVER_TIMESTAMP
+    })
+    return swiped_data
+
+
 @match_routes.route('/swipe', methods=['POST'])
 def swipe():
     
@@ -135,41 +301,28 @@ def swipe():
         if user_id == swiped_id:
             return jsonify({"error": "Users cannot swipe on themselves"}), 400
 
-        user_doc = db.collection('users').document(user_id)
-        swiped_doc = db.collection('users').document(swiped_id)
-
-        user_doc.update({f'liked_users.{swiped_id}': True})
-
-        swiped_user_doc = swiped_doc.get()
-        if swiped_user_doc.exists:
-            data = swiped_user_doc.to_dict()
-            if user_id in data.get('liked_users', {}):
-                user_doc.update({'matched_users': firestore.ArrayUnion([swiped_id])})
-                swiped_doc.update({'matched_users': firestore.ArrayUnion([user_id])})
+        # One batched read of both like edges and one atomic commit of every write
+        with span("record_swipe"):
+            data = _record_swipe(db.transaction(), user_id, swiped_id)
+        invalidate_user_profile(user_id, swiped_id)
+        user_replica.note_like(user_id, swiped_id, matched=data is not None)
+        if data is None:
+            return jsonify({"match": False})
 
-                convo_id = get_convo_id(user_id, swiped_id)
-                db.collection('conversations').document(convo_id).set({
-                    'participants': [user_id, swiped_id],
-                    'lastMessage': None,
-                    'lastUpdated': firestore.SERVER_TIMESTAMP
-                })
+        token = data.get('notification_token')
+        name = f"{data.get('settings', {}).get('firstName', 'Someone')} {data.get('settings', {}).get('lastName', '')}"
 
-                token = data.get('notification_token')
-                name = f"{data.get('settings', {}).get('firstName', 'Someone')} {data.get('settings', {}).get('lastName', '')}"
+        if not token:
+            return jsonify({"error": "User has no notification token"}), 400
 
-                if not token:
-                    return jsonify({"error": "User has no notification token"}), 400
+        enqueue_notification(
+            token,
+            "RUmble",
+            f"You matched with {name}.",
+            {'userID': user_id, 'matchName': name, 'screen': '/messagingChat'}
+        )
 
-                send_notification(
-                    token,
-                    "RUmble",
-                    f"You matched with {name}.",
-                    {'userID': user_id, 'matchName': name, 'screen': '/messagingChat'}
-                )
-
-                return jsonify({"match": True, "notified": True}), 200
-
-        return jsonify({"match": False})
+        return jsonify({"match": True, "notified": True}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -191,20 +344,120 @@ def get_matches():
     if not matches:
         return jsonify({"matches": []}), 200
 
+    # One batched read of just the card fields, instead of a read per match
     detailed = []
-    for m in matches:
-        p = get_user_profile(m)
+    for m, p in zip(matches, get_user_profiles(matches, MATCH_CARD_FIELDS)):
         if p:
             p["id"] = m
             detailed.append(p)
 
-    return jsonify({"matches": detailed}), 200
+    # The cards change when any match edits their name or picture, so the
+    # tag is a hash of the response body
+    response = jsonify({"matches": detailed})
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@match_routes.route('/liked_me', methods=['GET'])
+def liked_me():
+    """
+    GET /liked_me
+    Returns the users who liked the caller and are still waiting on a like
+    back, newest like first, as suggestion summaries with a `likedAt` time.
+
+    Query parameters (all optional):
+      - limit (int): page size, LIKED_ME_PAGE_SIZE by default, capped at
+        MAX_LIKED_ME_PAGE_SIZE.
+      - after (user ID): `nextAfter` from the previous page; returns the
+        likes older than that user's. `nextAfter` is null on the last page.
+
+    Costs one query over the caller's incoming like edges, then one batched
+    read of the likers (none when the user replica is ready).
+    """
+    try:
+        decoded_token, error = verify_token()
+        if error:
+            return error
+
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else LIKED_ME_PAGE_SIZE
+        except ValueError:
+            return jsonify({"error": "Invalid 'limit'"}), 400
+        if limit < 1:
+            return jsonify({"error": "Invalid 'limit'"}), 400
+        limit = min(limit, MAX_LIKED_ME_PAGE_SIZE)
+
+        user_id = decoded_token["uid"]
+        query = pending_likes_of(user_id)
+        after = request.args.get('after')
+        if after:
+            cursor = like_ref(after, user_id).get()
+            if not cursor.exists:
+                return jsonify({"error": "Unknown 'after' user"}), 400
+            query = query.start_after(cursor)
+
+        # One extra edge tells whether another page follows
+        edges = [doc.to_dict() for doc in query.select(['liker', 'createdAt']).limit(limit + 1).stream()]
+        has_more = len(edges) > limit
+        edges = edges[:limit]
+        found = _read_users([edge['liker'] for edge in edges]) if edges else {}
+
+        users = []
+        for edge in edges:
+            if edge['liker'] in found:
+                summary = build_user_summary(edge['liker'], found[edge['liker']])
+                liked_at = edge.get('createdAt')
+                summary['likedAt'] = liked_at.isoformat() if isinstance(liked_at, datetime) else None
+                users.append(summary)
+
+        next_after = edges[-1]['liker'] if has_more else None
+        return jsonify({'users': users, 'nextAfter': next_after}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _parse_since(value):
+    """
+    Returns the datetime a `since` timestamp names (ISO 8601, or epoch
+    milliseconds), or None if `value` is not a timestamp.
+    """
+    try:
+        if value.isdigit():
+            return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _serialize_message(snapshot):
+    doc = snapshot.to_dict()
+    timestamp = doc.get('timestamp')
+    return {
+        'id': snapshot.id,
+        'text': doc.get('text'),
+        'sender_id': doc.get('sender_id'),
+        'timestamp': timestamp.isoformat() if isinstance(timestamp, datetime) else None,
+    }
 
 
 @match_routes.route('/conversation', methods=['GET'])
 def get_conversation():
     """
     GET /conversation?targetID=<user>
+    Returns messages oldest first, ordered by `timestamp` on the server.
+
+    Query parameters (all optional):
+      - limit (int): return at most this many messages. With `before` or no
+        cursor these are the newest ones; with `since`, the oldest new ones.
+      - before (message ID): page back through history; returns messages
+        older than this one. `nextBefore` is the cursor for the page before,
+        or null once the start of the conversation is reached.
+      - since (ISO 8601 timestamp, epoch milliseconds, or message ID): only
+        messages newer than this, so polling clients fetch just the delta.
+
+    Without `limit` the whole history (or the whole delta) is returned.
     """
     try:
         decoded_token, error = verify_token()
@@ -215,6 +468,17 @@ def get_conversation():
         if not target_id:
             return jsonify({"error": "Missing 'targetID'"}), 400
 
+        before = request.args.get('before')
+        since = request.args.get('since')
+        if before and since:
+            return jsonify({"error": "Use either 'before' or 'since', not both"}), 400
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({"error": "Invalid 'limit'"}), 400
+        if limit is not None and limit < 1:
+            return jsonify({"error": "Invalid 'limit'"}), 400
+
         user_id = decoded_token["uid"]
         user_doc = db.collection("users").document(user_id).get()
         if not user_doc.exists:
@@ -225,27 +489,92 @@ def get_conversation():
             return jsonify({"error": "You are not matched with target user"}), 404
 
         convo_id = get_convo_id(user_id, target_id)
-        msgs = db.collection('conversations') \
-                 .document(convo_id) \
-                 .collection('messages') \
-                 .stream()
-
-        # Build a JSON‑safe response, dropping the SERVER_TIMESTAMP placeholder
-        out = []
-        for m in msgs:
-            doc = m.to_dict()
-            out.append({
-                'id': m.id,
-                'text': doc.get('text'),
-                'sender_id': doc.get('sender_id'),
-            })
-
-        return jsonify({'messages': out})
+        messages_ref = db.collection('conversations').document(convo_id).collection('messages')
+
+        if since:
+            # Delta mode: messages after a point in time or after a known message
+            cursor = _parse_since(since)
+            if cursor is not None:
+                cursor = {'timestamp': cursor}
+            else:
+                cursor = messages_ref.document(since).get()
+                if not cursor.exists:
+                    return jsonify({"error": "Unknown 'since' message"}), 400
+            query = messages_ref.order_by('timestamp').start_after(cursor)
+            if limit:
+                query = query.limit(limit)
+            return jsonify({'messages': [_serialize_message(m) for m in query.stream()]})
+
+        # History mode: newest first from the server, flipped to oldest first
+        query = messages_ref.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        if before:
+            cursor = messages_ref.document(before).get()
+            if not cursor.exists:
+                return jsonify({"error": "Unknown 'before' message"}), 400
+            query = query.start_after(cursor)
+        if limit:
+            query = query.limit(limit)
+
+        out = [_serialize_message(m) for m in query.stream()]
+        out.reverse()
+        next_before = out[0]['id'] if limit and len(out) == limit else None
+
+        return jsonify({'messages': out, 'nextBefore': next_before})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@match_routes.route('/conversation/stream', methods=['GET'])
+def stream_conversation():
+    """
+    GET /conversation/stream?targetID=<user>
+    Server-Sent Events stream of messages sent in the conversation from now
+    on. Each event is `event: message` with the message JSON (same shape as
+    /conversation) as data and its ID as the event ID. After a reconnect,
+    fetch anything missed with /conversation?since=<last event ID>.
+    """
+    decoded_token, error = verify_token()
+    if error:
+        return error
+
+    target_id = request.args.get('targetID')
+    if not target_id:
+        return jsonify({"error": "Missing 'targetID'"}), 400
+
+    user_id = decoded_token["uid"]
+    user_doc = db.collection("users").document(user_id).get()
+    if not user_doc.exists:
+        return jsonify({"error": "User not found"}), 404
+    if target_id not in user_doc.to_dict().get('matched_users', []):
+        return jsonify({"error": "You are not matched with target user"}), 404
+
+    if broker.subscriber_count() >= MAX_CHAT_STREAMS:
+        return jsonify({"error": "Too many open streams, retry shortly"}), 503
+
+    # Subscribe before responding so nothing sent in between is missed
+    subscription = broker.subscribe(get_convo_id(user_id, target_id))
+
+    def events():
+        try:
+            yield f"retry: {CHAT_STREAM_RETRY_MS}\n\n"
+            deadline = time.monotonic() + CHAT_STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=CHAT_STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: message\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # no proxy buffering
+    response.call_on_close(subscription.close)
+    return response
+
+
 @match_routes.route('/message', methods=['POST'])
 def send_message():
     
@@ -262,7 +591,12 @@ def send_message():
             return jsonify({"error": "Missing 'targetID' or 'message'"}), 400
 
         user_id = decoded_token["uid"]
-        user_doc = db.collection("users").document(user_id).get()
+        # The sender check and the recipient's push token are independent reads
+        users = db.collection("users")
+        user_doc, target_doc = gather(
+            ("read_sender", users.document(user_id).get),
+            ("read_target", users.document(target_id).get),
+        )
         if not user_doc.exists:
             return jsonify({"error": "User not found"}), 404
 
@@ -271,34 +605,40 @@ def send_message():
             return jsonify({"error": "You are not matched with target user"}), 404
 
         convo_id = get_convo_id(user_id, target_id)
+        convo_ref = db.collection('conversations').document(convo_id)
         message_data = {
             'text': text,
             'sender_id': user_id,
             'timestamp': firestore.SERVER_TIMESTAMP
         }
+        tok = target_doc.to_dict().get("notification_token") if target_doc.exists else None
+        name = data.get("settings", {}).get("firstName", "Someone")
+
+        # Store the message and, if the recipient gets a push, bump the
+        # conversation summary at the same time
+        writes = [("add_message", lambda: convo_ref.collection('messages').add(message_data))]
+        if tok:
+            writes.append(("update_conversation", lambda: convo_ref.update({
+                'lastMessage': text,
+                'lastUpdated': firestore.SERVER_TIMESTAMP
+            })))
+        (update_time, msg_doc), *_ = gather(*writes)
+
+        # The write time is the server timestamp the message was stored with
+        publish_message(convo_id, {
+            'id': msg_doc.id,
+            'text': text,
+            'sender_id': user_id,
+            'timestamp': update_time.isoformat() if isinstance(update_time, datetime) else None,
+        })
 
-        _, msg_doc = db.collection('conversations') \
-                       .document(convo_id) \
-                       .collection('messages') \
-                       .add(message_data)
-
-        target_doc = db.collection("users").document(target_id).get()
-        if target_doc.exists:
-            td = target_doc.to_dict()
-            tok = td.get("notification_token")
-            name = data.get("settings", {}).get("firstName", "Someone")
-
-            if tok:
-                send_notification(
-                    tok,
-                    f"New Message from {name}!",
-                    text,
-                    {'userID': user_id, 'matchName': name, 'screen': '/messagingChat'}
-                )
-                db.collection('conversations').document(convo_id).update({
-                    'lastMessage': text,
-                    'lastUpdated': firestore.SERVER_TIMESTAMP
-                })
+        if tok:
+            enqueue_notification(
+                tok,
+                f"New Message from {name}!",
+                text,
+                {'userID': user_id, 'matchName': name, 'screen': '/messagingChat'}
+            )
 
         return jsonify({'success': True, 'messageID': msg_doc.id})
 
@@ -312,7 +652,7 @@ def delete_match():
     POST /delete_match
     Body: { "targetID": "<other_user_id>" }
     Unmatches the two users, deletes their conversation and all messages,
-    and cleans up their like maps.
+    and deletes their likes of each other.
     """
     try:
         decoded_token, error = verify_token()
@@ -327,37 +667,38 @@ def delete_match():
         if user_id == target_id:
             return jsonify({"error": "Cannot unmatch yourself"}), 400
 
-        # Fetch both profiles to confirm they are matched
-        user_profile = get_user_profile(user_id) or {}
-        target_profile = get_user_profile(target_id) or {}
+        # Confirm they are matched against the stored document, not a cached copy
+        user_profile = get_user_profile(user_id, fresh=True) or {}
         if target_id not in user_profile.get('matched_users', []):
             return jsonify({"error": "You are not matched with this user"}), 404
 
-        # 1) Remove from matched_users arrays
+        # 1) Unmatch and drop both likes: one update per user and both like
+        #    edges, committed together. Like maps not yet migrated to edges
+        #    are cleaned up too.
         user_ref   = db.collection('users').document(user_id)
         target_ref = db.collection('users').document(target_id)
-        user_ref.update({
-            'matched_users': firestore.ArrayRemove([target_id])
+        batch = db.batch()
+        batch.update(user_ref, {
+            'matched_users': firestore.ArrayRemove([target_id]),
+            f'liked_users.{target_id}': firestore.DELETE_FIELD,
         })
-        target_ref.update({
-            'matched_users': firestore.ArrayRemove([user_id])
+        batch.update(target_ref, {
+            'matched_users': firestore.ArrayRemove([user_id]),
+            f'liked_users.{user_id}': firestore.DELETE_FIELD,
         })
-
-        # 2) Remove likes entries (delete the map keys)
-        user_ref.update({ f'liked_users.{target_id}': firestore.DELETE_FIELD })
-        target_ref.update({ f'liked_users.{user_id}': firestore.DELETE_FIELD })
-
-        # 3) Delete conversation + all messages
-        convo_id = get_convo_id(user_id, target_id)
-        convo_ref = db.collection('conversations').document(convo_id)
-
-        # delete all messages in the subcollection
-        msgs = convo_ref.collection('messages').stream()
-        for msg in msgs:
-            msg.reference.delete()
-
-        # delete the conversation document itself
-        convo_ref.delete()
+        batch.delete(like_ref(user_id, target_id))
+        batch.delete(like_ref(target_id, user_id))
+
+        # 2) Delete the conversation and its messages in batches, alongside
+        #    the unmatch; very long conversations finish in the background
+        try:
+            gather(
+                ("unmatch", batch.commit),
+                ("delete_conversation", lambda: delete_conversation(get_convo_id(user_id, target_id))),
+            )
+        finally:
+            invalidate_user_profile(user_id, target_id)
+        user_replica.note_unmatch(user_id, target_id)
 
         return jsonify({"success": True}), 200
 
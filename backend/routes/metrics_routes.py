@@ -0,0 +1,28 @@
+from flask import Blueprint, Response, request
+from services import metrics
+from services.auth_service import token_cache
+from services.firebase_service import http_pool_stats, profile_cache_stats
+from services.push_queue import push_queue
+from services.user_replica import user_replica
+from http import HTTPStatus
+import os
+
+metrics_routes = Blueprint("metrics_routes", __name__)
+
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@metrics_routes.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus scrape endpoint: per-route histograms plus pool, cache, queue and replica gauges."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response(status=HTTPStatus.FORBIDDEN)
+
+    body = metrics.render([
+        ("rumble_http_pool", http_pool_stats()),
+        ("rumble_token_cache", token_cache.stats()),
+        ("rumble_profile_cache", profile_cache_stats()),
+        ("rumble_push_queue", push_queue.metrics()),
+        ("rumble_user_replica", user_replica.stats()),
+    ])
+    return Response(body, mimetype="text/plain; version=0.0.4")
@@ -1,7 +1,9 @@
-from flask import Flask, Blueprint, request, jsonify
-from services.firebase_service import get_user_profile, update_user_profile, update_user_settings, delete_user_account, create_user_in_firebase
+from flask import Flask, Blueprint, Response, request, jsonify
+from services.firebase_service import get_user_document, get_user_profile, update_user_profile, update_user_settings, delete_user_account, create_user_in_firebase, is_email_registered, invalidate_user_profile
 from services.auth_service import verify_token
+from services.suggestion_queue import schedule_queue_refresh
 from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
 from http import HTTPStatus
 from difflib import SequenceMatcher
 from services.firebase_service import db
@@ -11,6 +13,44 @@ logger = logging.getLogger(__name__)
 
 user_routes = Blueprint("user_routes", __name__)
 
+def _requested_fields():
+    """Dotted field paths asked for with ?fields=a.b,c, or None for everything."""
+    raw = request.args.get("fields", "")
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    return fields or None
+
+def _project(data, fields):
+    """Keeps only the given dotted field paths of a document."""
+    if fields is None:
+        return data
+    out = {}
+    for path in fields:
+        *parents, leaf = path.split(".")
+        src, dst = data, out
+        for key in parents:
+            src = src.get(key) if isinstance(src, dict) else None
+            dst = dst.setdefault(key, {})
+        if isinstance(src, dict) and leaf in src:
+            dst[leaf] = src[leaf]
+    return out
+
+def _if_match():
+    """Document version the request's If-Match header requires, if any."""
+    tags = request.if_match
+    if tags.star_tag or not tags:
+        return None
+    return next(iter(tags))
+
+def _document_response(data, version):
+    """The requested fields of a user document, tagged with its version."""
+    response = jsonify(_project(data, _requested_fields()))
+    if version:
+        response.set_etag(version)
+    return response, HTTPStatus.OK
+
+def _version_conflict():
+    return jsonify({"error": "Profile was changed since it was read"}), HTTPStatus.PRECONDITION_FAILED
+
 @user_routes.route("/profile", methods=["GET"])
 def get_profile():
     """Fetch logged-in user's profile."""
@@ -19,10 +59,15 @@ def get_profile():
         return error  # Return error response if token is invalid
 
     user_id = decoded_token["uid"]
-    profile = get_user_profile(user_id)
+    profile, version = get_user_document(user_id)
 
     if profile:
-        return jsonify(profile), HTTPStatus.OK
+        # The client's copy is current: answer from the cached version alone
+        if version and request.if_none_match.contains(version):
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+            response.set_etag(version)
+            return response
+        return _document_response(profile, version)
     return jsonify({"error": "Profile not found"}), HTTPStatus.NOT_FOUND
 
 @user_routes.route("/update_profile", methods=["PUT"])
@@ -43,8 +88,14 @@ def edit_profile():
         return jsonify({"error": f"Missing required fields: {missing_fields}"}), HTTPStatus.BAD_REQUEST
 
     profile_data = {field: data[field] for field in required_fields}
-    if update_user_profile(user_id, profile_data):
-        return jsonify(get_user_profile(user_id)), HTTPStatus.OK
+    try:
+        version = update_user_profile(user_id, profile_data, if_version=_if_match())
+    except FailedPrecondition:
+        return _version_conflict()
+    if version:
+        schedule_queue_refresh(user_id)
+        # The written fields are the response; no need to read them back
+        return _document_response({"profile": profile_data}, version)
     return jsonify({"error": "Profile update failed"}), HTTPStatus.INTERNAL_SERVER_ERROR
 
 @user_routes.route("/update_settings", methods=["PUT"])
@@ -65,8 +116,12 @@ def edit_settings():
         return jsonify({"error": f"Missing required fields: {missing_fields}"}), HTTPStatus.BAD_REQUEST
 
     settings_data = {field: data[field] for field in required_fields}
-    if update_user_settings(user_id, settings_data):
-        return jsonify(get_user_profile(user_id)), HTTPStatus.OK
+    try:
+        version = update_user_settings(user_id, settings_data, if_version=_if_match())
+    except FailedPrecondition:
+        return _version_conflict()
+    if version:
+        return _document_response({"settings": settings_data}, version)
     return jsonify({"error": "Settings update failed"}), HTTPStatus.INTERNAL_SERVER_ERROR
 
 @user_routes.route("/delete_account", methods=["DELETE"])
@@ -89,7 +144,7 @@ def create_user():
     API endpoint to create a new user in Firebase Auth & Firestore.
     - Validates email domain, duplicate emails, password rules, and required fields.
     - Stores profile information in Firestore.
-    - Initializes `liked_users` as an empty map and `matched_users` as an empty list.
+    - Initializes `matched_users` as an empty list; likes are stored as like edges.
     """
     try:
         data = request.json or {}
@@ -115,11 +170,9 @@ def create_user():
             # Completely invalid domain
             return jsonify({"error": "Only @rutgers.edu or @scarletmail.rutgers.edu emails are allowed"}), HTTPStatus.BAD_REQUEST
 
-        # Duplicate Email Check
-        for doc in db.collection("users").stream():
-            existing = doc.to_dict().get("settings", {}).get("email", "").lower()
-            if existing == email:
-                return jsonify({"error": "Email already in use"}), HTTPStatus.BAD_REQUEST
+        # Duplicate Email Check: one read of the email's reservation document
+        if is_email_registered(email):
+            return jsonify({"error": "Email already in use"}), HTTPStatus.BAD_REQUEST
 
         # Assemble Firestore document
         user_data = {
@@ -144,12 +197,14 @@ def create_user():
                 "userType": data.get("userType", "mentee"),
                 "mentorshipAreas": data.get("mentorshipAreas", [])
             },
-            "liked_users": {},
             "matched_users": [],
             "notification_token": None
         }
 
         result = create_user_in_firebase(email, password, user_data)
+        if result.get("error") == "Email already in use":
+            # Lost a race with a concurrent signup for the same address
+            return jsonify(result), HTTPStatus.BAD_REQUEST
         if "error" in result:
             return jsonify(result), HTTPStatus.INTERNAL_SERVER_ERROR
         return jsonify(result), HTTPStatus.CREATED
@@ -177,4 +232,5 @@ def set_notification_token():
     if not user_ref.get().exists:
         return jsonify({'fail': 'user not found'}), HTTPStatus.NOT_FOUND
     user_ref.update({"notification_token": token})
+    invalidate_user_profile(user_id)
     return jsonify({'notice': 'success!'}), HTTPStatus.CREATED
@@ -1,9 +1,35 @@
 from flask import request, jsonify
 from firebase_admin import auth
+from services.cache import TTLCache
+from services import metrics
+import hashlib
+import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Verified ID tokens, keyed by a SHA-256 of the raw token so tokens are never
+# held as keys. Entries expire at the token's own `exp` claim; Firebase ID
+# tokens live for an hour, which also caps how long an entry can stay.
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=3600,
+)
+
+def verify_id_token_cached(id_token):
+    """
+    Verifies a Firebase ID token, reusing the result of an earlier verification
+    of the same token. Concurrent requests carrying the same token share one
+    verification. Raises the same errors as `auth.verify_id_token`.
+    """
+    key = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+    return token_cache.get_or_load(
+        key,
+        lambda: auth.verify_id_token(id_token),
+        ttl=lambda decoded: decoded.get("exp", 0) - time.time(),
+    )
+
 def verify_token():
     """Verifies Firebase ID token from Authorization header."""
     auth_header = request.headers.get("Authorization")
@@ -14,7 +40,8 @@ def verify_token():
         return None, (jsonify({"error": "Missing Authorization header"}), 403)
 
     try:
-        decoded_token = auth.verify_id_token(auth_header)
+        with metrics.timed(metrics.token_verification, "auth_seconds"):
+            decoded_token = verify_id_token_cached(auth_header)
         return decoded_token, None
     except auth.ExpiredIdTokenError:
         return None, (jsonify({"error": "Expired token"}), 403)
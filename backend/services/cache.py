@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire `ttl` seconds
+    after they are stored (or after a per-entry ttl passed to `set`).
+    Keeps hit/miss counters and can guard against cache stampedes.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}         # key -> Future shared by concurrent loaders
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl=None):
+        """Stores `value`; `ttl` overrides the default lifetime and is capped by it."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Returns the cached value for `key`, calling `loader()` on a miss.
+
+        Concurrent misses on the same key share a single `loader()` call;
+        its exception, if any, is raised to every waiter and nothing is cached.
+
+        Args:
+            key: cache key
+            loader (callable): computes the value
+            ttl (callable, optional): value -> lifetime in seconds
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = loader()
+            self.set(key, value, ttl(value) if ttl else None)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
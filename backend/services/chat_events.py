@@ -0,0 +1,148 @@
+"""
+Publish/subscribe fan-out of new chat messages to streaming clients.
+
+/message publishes each stored message on its conversation's channel and
+/conversation/stream subscribers receive it. The backend is picked once per
+process from CHAT_EVENTS_BACKEND:
+  - "memory" (default): fan-out inside this process only. Fine for a single
+    worker; with several, a client only sees messages sent through the
+    worker it is connected to.
+  - "redis": every publish goes through Redis pub/sub (REDIS_URL), and each
+    process fans it out to its own subscribers, so all workers share events.
+    Needs the `redis` package.
+"""
+import json
+import os
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before new ones are dropped for it
+SUBSCRIBER_QUEUE_SIZE = 100
+
+REDIS_CHANNEL_PREFIX = "chat:"
+
+
+class Subscription:
+    """One streaming client's view of a channel."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrives within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client must not block the publisher
+            self.dropped += 1
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryBroker:
+    """Fans events out to subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = {}  # channel -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Publishes through Redis pub/sub. One listener thread per process receives
+    every chat event and hands it to the local subscribers of its channel.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        import redis  # only needed for this backend
+
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{f"{REDIS_CHANNEL_PREFIX}*": self._on_message})
+        self._listener = self._pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def publish(self, channel, event):
+        self._redis.publish(f"{REDIS_CHANNEL_PREFIX}{channel}", json.dumps(event))
+
+    def _on_message(self, message):
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        try:
+            event = json.loads(message["data"])
+        except ValueError:
+            logger.warning(f"Dropping malformed chat event on {channel}")
+            return
+        self._deliver(channel[len(REDIS_CHANNEL_PREFIX):], event)
+
+
+def create_broker():
+    backend = os.getenv("CHAT_EVENTS_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisBroker(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        raise ValueError(f"Unknown CHAT_EVENTS_BACKEND: {backend}")
+    return InMemoryBroker()
+
+
+# Shared per-process broker
+broker = create_broker()
+
+
+def publish_message(convo_id, message):
+    """
+    Announces a stored message to the conversation's subscribers. Failures
+    are logged, never raised: the message is already saved and clients
+    catch up through /conversation?since=.
+    """
+    try:
+        broker.publish(convo_id, message)
+    except Exception as e:
+        logger.warning(f"Failed to publish chat event for {convo_id}: {e}")
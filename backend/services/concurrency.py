@@ -0,0 +1,46 @@
+"""
+Runs a request's independent Firestore calls at the same time, so the
+request waits for the slowest one rather than for their sum.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.tracing import record_span
+
+# Shared by all requests in the process. Under gevent workers these threads
+# are greenlets.
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "32"))
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+
+def _run(fn):
+    """(result, error, start, end) of one call."""
+    start = time.perf_counter()
+    try:
+        return fn(), None, start, time.perf_counter()
+    except Exception as e:
+        return None, e, start, time.perf_counter()
+
+
+def gather(*calls):
+    """
+    Runs (name, fn) pairs concurrently and returns their results in order.
+    The first call runs on the calling thread, the rest on a shared pool.
+    Each is recorded as a request span under its name. If any call raises,
+    the first error (in argument order) is raised once all have finished.
+    Gathered calls must not gather themselves.
+    """
+    # Each call runs in a copy of the caller's context, so it sees the request
+    futures = [_pool.submit(contextvars.copy_context().run, _run, fn) for _, fn in calls[1:]]
+    outcomes = [_run(calls[0][1])] if calls else []
+    outcomes += [future.result() for future in futures]
+
+    # Spans are recorded here, on the thread that holds the request context
+    for (name, _), (_, _, start, end) in zip(calls, outcomes):
+        record_span(name, start, end)
+    for _, error, _, _ in outcomes:
+        if error is not None:
+            raise error
+    return [result for result, _, _, _ in outcomes]
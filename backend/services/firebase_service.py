@@ -3,9 +3,22 @@ import firebase_admin
 from firebase_admin import credentials, firestore, auth
 from config import FIREBASE_CREDENTIALS  
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import base64
+from urllib.parse import quote
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from google.cloud.firestore_v1 import FieldFilter
+from datetime import datetime, timedelta, timezone
+import itertools
 import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from flask import g, has_request_context
+from services.cache import TTLCache
+from services import metrics
+from services.suggestion_index import suggestion_index, build_excluded_ids
+from services.user_replica import user_replica
 
 logger = logging.getLogger(__name__)
 firebase_credentials_b64 = os.getenv("FIREBASE_CREDENTIALS")
@@ -23,6 +36,49 @@ else:
 # Initialize Firestore client
 db = firestore.client()
 
+# Shared keep-alive HTTP client for outbound calls (Expo push). One session per
+# process; its connection pool is thread-safe, so gunicorn worker threads reuse
+# warm TCP+TLS connections instead of opening one per notification.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_TIMEOUT = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "10")),
+)
+
+http_session = requests.Session()
+_http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+http_session.mount("https://", _http_adapter)
+http_session.mount("http://", _http_adapter)
+http_session.hooks["response"].append(metrics.observe_http)
+
+def http_pool_stats():
+    """Connections opened vs. reused by the shared HTTP client since startup."""
+    pools = _http_adapter.poolmanager.pools
+    opened = requests_made = 0
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is not None:
+            opened += pool.num_connections
+            requests_made += pool.num_requests
+    return {
+        "connectionsOpened": opened,
+        "connectionsReused": max(requests_made - opened, 0),
+        "requests": requests_made,
+    }
+
+# Expo push API; push_queue and send_notification both post here
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+
+def build_push_message(token, title, body, data=None):
+    """Expo push message for one device."""
+    return {
+        "to": token,
+        "title": title,
+        "body": body,
+        "sound": "default",
+        "data": data or {}  # used for routing/navigation
+    }
+
 def send_notification(token, title, body, data=None):
     """
     Creates a notification
@@ -32,19 +88,13 @@ def send_notification(token, title, body, data=None):
         body (string): text content of notification
         data (json, optional): payload for navigation/other actions. Defaults to None.
     """
-    payload = {
-        "to": token,
-        "title": title,
-        "body": body,
-        "sound": "default",
-        "data": data or {}  # used for routing/navigation
-    }
+    payload = build_push_message(token, title, body, data)
 
     headers = {
         "Content-Type": "application/json"
     }
 
-    response = requests.post("https://exp.host/--/api/v2/push/send", json=payload, headers=headers)
+    response = http_session.post(EXPO_PUSH_URL, json=payload, headers=headers, timeout=HTTP_TIMEOUT)
     return response.json()
 
 def get_convo_id(user_id_1: str, user_id_2: str, prefix: str = "") -> str:
@@ -56,23 +106,386 @@ def get_convo_id(user_id_1: str, user_id_2: str, prefix: str = "") -> str:
     parts = sorted([user_id_1, user_id_2])
     return f"{prefix}_" + "_".join(parts)
 
-def get_user_profile(user_id):
-    """Retrieve a user's profile from Firestore."""
-    user_ref = db.collection("users").document(user_id).get()
-    return user_ref.to_dict() if user_ref.exists else None
+# One document per registered email, keyed by the normalized address, so
+# uniqueness is a point read and is enforced atomically on write
+EMAILS_COLLECTION = "emails"
 
-def update_user_profile(user_id, profile_data):
-    """Update a user's profile."""
-    user_ref = db.collection("users").document(user_id)
-    user_ref.set({"profile": profile_data}, merge=True)
-    return True
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+def email_reservation(email):
+    """Reference to the reservation document for an email address."""
+    # Document IDs cannot contain "/", so the address is percent-encoded
+    return db.collection(EMAILS_COLLECTION).document(quote(normalize_email(email), safe="@"))
+
+def is_email_registered(email):
+    # The replica answers from memory. A duplicate that gets past it is still
+    # rejected by the reservation written with the user document.
+    if user_replica.ready:
+        return user_replica.has_email(email)
+    return email_reservation(email).get().exists
+
+# One document per like, keyed by liker and likee, so "did B like A" is a
+# point read and likes never grow the user document. Queried by `likee`,
+# the same documents are the reverse index of who liked a user; `matched`
+# marks the likes that turned into a match, so pending ones are a query.
+LIKES_COLLECTION = "likes"
+
+def like_ref(liker_id, likee_id):
+    """Reference to the edge recording that liker_id liked likee_id."""
+    # IDs are percent-encoded so the ":" between them is unambiguous
+    return db.collection(LIKES_COLLECTION).document(f"{quote(liker_id, safe='')}:{quote(likee_id, safe='')}")
 
-def update_user_settings(user_id, settings_data):
-    """Update a user's settings."""
+def like_edge(liker_id, likee_id, matched=False):
+    return {"liker": liker_id, "likee": likee_id, "matched": matched, "createdAt": firestore.SERVER_TIMESTAMP}
+
+def likes_by(user_id):
+    """Query over the edges of the likes user_id has given."""
+    return db.collection(LIKES_COLLECTION).where(filter=FieldFilter("liker", "==", user_id))
+
+def likes_of(user_id):
+    """Query over the edges of the likes user_id has received."""
+    return db.collection(LIKES_COLLECTION).where(filter=FieldFilter("likee", "==", user_id))
+
+def pending_likes_of(user_id):
+    """
+    Query over the likes user_id has received and not yet returned, newest
+    first. Needs the composite index likes(likee, matched, createdAt desc).
+    """
+    return (likes_of(user_id)
+            .where(filter=FieldFilter("matched", "==", False))
+            .order_by("createdAt", direction=firestore.Query.DESCENDING))
+
+def get_liked_by_ids(user_id):
+    """
+    IDs of the users who liked user_id, from the user replica; empty when it
+    is not ready, so callers that only use this to rank never pay a read.
+    """
+    return user_replica.liked_by_ids(user_id) if user_replica.ready else []
+
+def get_liked_ids(user_id):
+    """IDs of the users user_id has liked, from the user replica or one query over their edges."""
+    if user_replica.ready:
+        return user_replica.liked_ids(user_id)
+    return [doc.to_dict()["likee"] for doc in likes_by(user_id).select(["likee"]).stream()]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def document_version(update_time):
+    """Opaque version tag of a stored document, used as its ETag."""
+    return format((update_time - _EPOCH) // timedelta(microseconds=1), "x")
+
+def _version_option(version):
+    """Write precondition: the document is still at `version`."""
+    try:
+        update_time = _EPOCH + timedelta(microseconds=int(version, 16))
+    except (TypeError, ValueError, OverflowError):
+        raise FailedPrecondition(f"Unknown document version {version!r}")
+    return db.write_option(last_update_time=update_time)
+
+# Recently read user documents and their versions. Writes made through this
+# process invalidate their entries; writes from other workers show up once the
+# TTL runs out.
+profile_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "30")),
+)
+_memo_hits = 0
+_memo_lock = threading.Lock()
+
+def _request_memo():
+    """User documents already read during the current request, if any."""
+    if not has_request_context():
+        return None
+    if "user_profiles" not in g:
+        g.user_profiles = {}
+    return g.user_profiles
+
+def _read_user_document(user_id):
+    snapshot = db.collection("users").document(user_id).get()
+    if not snapshot.exists:
+        return None, None
+    return snapshot.to_dict(), document_version(snapshot.update_time)
+
+def get_user_document(user_id, fresh=False):
+    """
+    Retrieve a user's profile and its version, read through the profile cache.
+    A document is read at most once per request. The returned dict is shared
+    with the cache, so callers must not modify it.
+    Args:
+        user_id (str): user to read
+        fresh (bool, optional): skip the cache and read Firestore, e.g. before a write
+    Returns:
+        (dict, str): the profile and its version, or (None, None) if the user does not exist
+    """
+    global _memo_hits
+    memo = _request_memo()
+    if memo is not None and user_id in memo:
+        with _memo_lock:
+            _memo_hits += 1
+        return memo[user_id]
+
+    if fresh:
+        document = _read_user_document(user_id)
+        profile_cache.set(user_id, document)
+    else:
+        document = profile_cache.get_or_load(user_id, lambda: _read_user_document(user_id))
+    if memo is not None:
+        memo[user_id] = document
+    return document
+
+def get_user_profile(user_id, fresh=False):
+    """Retrieve a user's profile; see get_user_document."""
+    return get_user_document(user_id, fresh)[0]
+
+def invalidate_user_profile(*user_ids):
+    """Drops cached copies of users whose documents were just written."""
+    memo = _request_memo()
+    for user_id in user_ids:
+        profile_cache.pop(user_id)
+        if memo is not None:
+            memo.pop(user_id, None)
+
+def profile_cache_stats():
+    """Profile cache size and hit ratio, plus reads saved by the request memo."""
+    return {**profile_cache.stats(), "memoHits": _memo_hits}
+
+# Documents requested per batched read
+GET_ALL_CHUNK_SIZE = 100
+
+# Fields the matches tab renders for each match
+MATCH_CARD_FIELDS = ("settings.firstName", "settings.lastName", "profile.profilePictureUrl")
+
+def get_user_profiles(user_ids, field_paths=None):
+    """
+    Retrieve several users with batched multi-document reads.
+    Args:
+        user_ids (list): user IDs to read
+        field_paths (iterable, optional): only return these fields, e.g. "settings.firstName"
+    Returns:
+        list: one dict (or None if the user does not exist) per ID, in the order given
+    """
+    users = db.collection("users")
+    found = {}
+    for start in range(0, len(user_ids), GET_ALL_CHUNK_SIZE):
+        refs = [users.document(uid) for uid in user_ids[start:start + GET_ALL_CHUNK_SIZE]]
+        # get_all yields snapshots in no particular order
+        for doc in db.get_all(refs, field_paths=list(field_paths) if field_paths else None):
+            if doc.exists:
+                found[doc.id] = doc.to_dict()
+    return [found.get(uid) for uid in user_ids]
+
+def get_excluded_ids(user_id, user_data=None):
+    """
+    Frozen set of user IDs to leave out of user_id's suggestions.
+    Matches come from `user_data` when given, otherwise from the user
+    replica, which the listener keeps current, or else a fresh read of the
+    user's document. Likes come from their like edges (get_liked_ids).
+    Either way, likes and matches written by any worker apply at once.
+    """
+    if user_data is None and user_replica.ready:
+        user_data = user_replica.get(user_id)
+    if user_data is None:
+        user_doc = db.collection("users").document(user_id).get()
+        user_data = user_doc.to_dict() if user_doc.exists else {}
+    return build_excluded_ids(user_id, user_data, get_liked_ids(user_id))
+
+# Firestore allows at most 500 writes per batch
+WRITE_BATCH_SIZE = 500
+DELETE_BATCH_SIZE = WRITE_BATCH_SIZE
+# Delete batches committed at the same time
+DELETE_CONCURRENCY = 4
+# Messages deleted inside the request; the rest of a longer conversation is
+# deleted by a background job
+INLINE_DELETE_LIMIT = int(os.getenv("INLINE_DELETE_LIMIT", "2000"))
+
+_background_deletes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-delete")
+
+def delete_documents(collection_ref, limit=None):
+    """
+    Deletes the documents of a collection in batched writes, with at most
+    DELETE_CONCURRENCY batches in flight. Document references are listed
+    page by page without reading their data.
+    Args:
+        collection_ref: collection to empty
+        limit (int, optional): stop after deleting this many documents
+    Returns:
+        (deleted, finished): how many were deleted and whether the collection is now empty
+    """
+    refs = iter(collection_ref.list_documents(page_size=DELETE_BATCH_SIZE))
+    deleted = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=DELETE_CONCURRENCY) as pool:
+        while limit is None or deleted < limit:
+            size = DELETE_BATCH_SIZE if limit is None else min(DELETE_BATCH_SIZE, limit - deleted)
+            chunk = list(itertools.islice(refs, size))
+            if not chunk:
+                break
+            batch = db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            if len(in_flight) >= DELETE_CONCURRENCY:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            in_flight.add(pool.submit(batch.commit))
+            deleted += len(chunk)
+        for future in in_flight:
+            future.result()
+    finished = next(refs, None) is None
+    return deleted, finished
+
+def _finish_conversation_delete(convo_ref):
+    try:
+        deleted, _ = delete_documents(convo_ref.collection("messages"))
+        convo_ref.delete()
+        logger.info(f"Deleted conversation {convo_ref.id} in the background ({deleted} more messages)")
+    except Exception as e:
+        logger.warning(f"Background delete of conversation {convo_ref.id} failed: {e}")
+
+def delete_conversation(convo_id):
+    """
+    Deletes a conversation and its messages. Up to INLINE_DELETE_LIMIT
+    messages are deleted right away; anything beyond that, plus the
+    conversation document, is left to a background job.
+    Returns:
+        Future of the background job, or None if everything was deleted inline
+    """
+    convo_ref = db.collection("conversations").document(convo_id)
+    _, finished = delete_documents(convo_ref.collection("messages"), limit=INLINE_DELETE_LIMIT)
+    if not finished:
+        return _background_deletes.submit(_finish_conversation_delete, convo_ref)
+    convo_ref.delete()
+    return None
+
+def load_suggestion_index():
+    """
+    Returns the in-process suggestion index, rebuilding it if stale from the
+    user replica when one is ready, otherwise from Firestore.
+    """
+    def stream_users():
+        if user_replica.ready:
+            return user_replica.documents()
+        return ((doc.id, doc.to_dict()) for doc in db.collection("users").stream())
+    return suggestion_index.load(stream_users)
+
+# Fields build_user_summary reads
+SUMMARY_FIELDS = (
+    "settings.firstName", "settings.lastName", "settings.ethnicity", "settings.gender",
+    "settings.pronouns", "profile.bio", "profile.major", "profile.gradYear", "profile.hobbies",
+    "profile.orgs", "profile.careerPath", "profile.interestedIndustries", "profile.mentorshipAreas",
+)
+
+def build_user_summary(uid, user_data):
+    """Card fields the swipe deck renders for a suggested user."""
+    profile = user_data.get("profile", {})
+    settings = user_data.get("settings", {})
+    return {
+        "id": uid,
+        "firstName": settings.get("firstName", "Unknown"),
+        "lastName": settings.get("lastName", ""),
+        "ethnicity": settings.get("ethnicity", ""),
+        "gender": settings.get("gender", ""),
+        "pronouns": settings.get("pronouns", ""),
+        "bio": profile.get("bio", ""),
+        "major": profile.get("major", ""),
+        "gradYear": profile.get("gradYear", ""),
+        "hobbies": profile.get("hobbies", []),
+        "orgs": profile.get("orgs", []),
+        "careerPath": profile.get("careerPath", ""),
+        "interestedIndustries": profile.get("interestedIndustries", []),
+        "mentorshipAreas": profile.get("mentorshipAreas", []),
+    }
+
+def update_user_profile(user_id, profile_data, if_version=None):
+    """
+    Update a user's profile.
+    Args:
+        user_id (str): user to update
+        profile_data (dict): the complete profile
+        if_version (str, optional): only write if the document is still at this version
+    Returns:
+        str: the document's new version
+    Raises:
+        FailedPrecondition: the document is no longer at `if_version`
+    """
     user_ref = db.collection("users").document(user_id)
-    user_ref.set({"settings": settings_data}, merge=True)
-    return True
+    try:
+        if if_version is None:
+            result = user_ref.set({"profile": profile_data}, merge=True)
+        else:
+            result = user_ref.update({"profile": profile_data}, option=_version_option(if_version))
+    finally:
+        invalidate_user_profile(user_id)
+    suggestion_index.upsert(user_id, profile_data)
+    return document_version(result.update_time)
 
+# Attempts at a settings write that keeps losing races with other writers
+SETTINGS_WRITE_ATTEMPTS = 5
+
+def update_user_settings(user_id, settings_data, if_version=None):
+    """
+    Update a user's settings, moving their email reservation if the address
+    changed. The write is conditional on the document being unchanged since
+    it was read, and is retried if another write got in between.
+    Args:
+        user_id (str): user to update
+        settings_data (dict): the complete settings
+        if_version (str, optional): only write if the document is still at this version
+    Returns:
+        str: the document's new version, or None if the new email belongs to someone else
+    Raises:
+        FailedPrecondition: the document is no longer at `if_version`
+    """
+    user_ref = db.collection("users").document(user_id)
+    for attempt in range(1, SETTINGS_WRITE_ATTEMPTS + 1):
+        snapshot = user_ref.get()
+        if if_version is not None and (
+            not snapshot.exists or document_version(snapshot.update_time) != if_version
+        ):
+            raise FailedPrecondition(f"User {user_id} is no longer at version {if_version}")
+
+        current = snapshot.to_dict() if snapshot.exists else {}
+        old_email = normalize_email(current.get("settings", {}).get("email"))
+        new_email = normalize_email(settings_data.get("email"))
+        batch = db.batch()
+        # Move the email reservation along with the address
+        if new_email and new_email != old_email:
+            batch.create(email_reservation(new_email), {"uid": user_id})
+            if old_email:
+                batch.delete(email_reservation(old_email))
+        if snapshot.exists:
+            batch.update(user_ref, {"settings": settings_data},
+                         option=db.write_option(last_update_time=snapshot.update_time))
+        else:
+            batch.create(user_ref, {"settings": settings_data})
+
+        try:
+            results = batch.commit()
+        except AlreadyExists:
+            if not snapshot.exists and user_ref.get().exists:
+                continue  # the user document appeared meanwhile
+            logger.warning(f"Settings update for {user_id} rejected: email already in use")
+            return None
+        except FailedPrecondition:
+            if if_version is not None or attempt == SETTINGS_WRITE_ATTEMPTS:
+                raise
+            continue
+        finally:
+            invalidate_user_profile(user_id)
+        return document_version(results[-1].update_time)
+    raise FailedPrecondition(f"User {user_id} kept changing during a settings update")
+
+
+def delete_like_edges(user_id):
+    """Deletes every like user_id gave or received, in batched writes. Returns how many."""
+    refs = [doc.reference for query in (likes_by(user_id), likes_of(user_id)) for doc in query.select([]).stream()]
+    for start in range(0, len(refs), WRITE_BATCH_SIZE):
+        batch = db.batch()
+        for ref in refs[start:start + WRITE_BATCH_SIZE]:
+            batch.delete(ref)
+        batch.commit()
+    return len(refs)
 
 def delete_user_account(user_id):
     try:
@@ -80,10 +493,19 @@ def delete_user_account(user_id):
         print(f"Attempting to delete user: {user_id}")  # Debugging
 
 
-        # Delete user document from Firestore
+        # Delete user document from Firestore, releasing their email
         user_ref = db.collection("users").document(user_id)  # Ensure correct indentation
-        if user_ref.get().exists:
-            user_ref.delete()
+        user_doc = user_ref.get()
+        if user_doc.exists:
+            batch = db.batch()
+            batch.delete(user_ref)
+            email = user_doc.to_dict().get("settings", {}).get("email")
+            if email:
+                batch.delete(email_reservation(email))
+            batch.commit()
+            invalidate_user_profile(user_id)
+            suggestion_index.remove(user_id)
+            delete_like_edges(user_id)
             logger.info(f"Deleted Firestore user document: {user_id}")
             print(f"Deleted Firestore user document: {user_id}")
 
@@ -129,9 +551,19 @@ def create_user_in_firebase(email, password, user_data):
         user = auth.create_user(email=email, password=password)
         user_id = user.uid
 
-        # Store user details in Firestore
+        # Store user details and reserve the email in one atomic write; the
+        # reservation fails if a concurrent signup claimed the address first
         user_ref = db.collection("users").document(user_id)
-        user_ref.set(user_data)
+        batch = db.batch()
+        batch.create(email_reservation(email), {"uid": user_id})
+        batch.set(user_ref, user_data)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            auth.delete_user(user_id)
+            return {"error": "Email already in use"}
+        invalidate_user_profile(user_id)  # may hold a cached miss
+        suggestion_index.upsert(user_id, user_data.get("profile", {}))
 
         return {"message": "User created successfully", "user_id": user_id}
 
@@ -180,4 +612,72 @@ def delete_all_users():
     print("All users deleted successfully.")
 
 
-# To delete all auth users, run function delete_all_users()
\ No newline at end of file
+# To delete all auth users, run function delete_all_users()
+
+
+"""
+- To reserve the emails of users created before email reservations existed,
+  run backfill_email_reservations() once:
+"""
+
+def backfill_email_reservations():
+    users = db.collection("users").select(["settings.email"]).stream()
+    batch = db.batch()
+    pending = reserved = 0
+    for doc in users:
+        email = (doc.to_dict() or {}).get("settings", {}).get("email")
+        if not email:
+            continue
+        # set() rather than create(), so the backfill can be re-run safely
+        batch.set(email_reservation(email), {"uid": doc.id})
+        pending += 1
+        if pending == WRITE_BATCH_SIZE:
+            batch.commit()
+            reserved += pending
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+        reserved += pending
+    logger.info(f"Reserved {reserved} emails")
+    print(f"Reserved {reserved} emails")
+
+
+"""
+- To move liked_users maps into like edges (LIKES_COLLECTION), run
+  migrate_liked_users() once, before /swipe checks edges only. It can be
+  re-run safely:
+"""
+
+def migrate_liked_users():
+    users = db.collection("users").select(["liked_users", "matched_users"]).stream()
+    batch = db.batch()
+    pending = migrated = 0
+    for doc in users:
+        data = doc.to_dict() or {}
+        liked = data.get("liked_users")
+        if liked is None:
+            continue
+        matched = set(data.get("matched_users") or [])
+        writes = [(like_ref(doc.id, likee_id), like_edge(doc.id, likee_id, likee_id in matched))
+                  for likee_id in liked]
+        # The map goes last, so it outlives any batch of its edges that fails
+        writes.append((doc.reference, None))
+        for ref, edge in writes:
+            if edge is None:
+                batch.update(ref, {"liked_users": firestore.DELETE_FIELD})
+            else:
+                batch.set(ref, edge)
+                migrated += 1
+            pending += 1
+            if pending == WRITE_BATCH_SIZE:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+    if pending:
+        batch.commit()
+    # Cached profiles still carry the maps
+    profile_cache.clear()
+    logger.info(f"Migrated {migrated} likes to edges")
+    print(f"Migrated {migrated} likes to edges")
+    return migrated
@@ -0,0 +1,306 @@
+"""
+Per-request instrumentation and Prometheus metrics.
+
+Every request records its wall time, Firestore RPCs, reads, writes,
+streamed documents and bytes read, plus time spent verifying the ID token and in
+outbound HTTP calls. When it finishes these are added to per-route
+histograms, which routes.metrics_routes serves as /metrics in the Prometheus
+text format.
+
+Firestore calls are counted by wrapping the methods of the client's
+reference, query, batch and client classes (instrument_firestore). Only the
+outermost call is counted, since the client library implements some calls in
+terms of others (DocumentReference.set commits a one-write batch).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from flask import g, has_request_context, request
+import logging
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+BYTES_BUCKETS = (0, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Prometheus histogram with one series per label set."""
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, counts in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            for bound, count in zip(self.buckets + ("+Inf",), counts[:len(self.buckets)] + [counts[-1]]):
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {count}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {counts[-2]}")
+            lines.append(f"{self.name}_count{suffix} {counts[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+ROUTE_LABELS = ("route", "method")
+
+request_duration = Histogram(
+    "rumble_request_duration_seconds", "Request wall time.", DURATION_BUCKETS, ROUTE_LABELS)
+request_rpcs = Histogram(
+    "rumble_request_firestore_rpcs", "Firestore round trips per request.", COUNT_BUCKETS, ROUTE_LABELS)
+request_reads = Histogram(
+    "rumble_request_firestore_reads", "Firestore documents read per request.", COUNT_BUCKETS, ROUTE_LABELS)
+request_writes = Histogram(
+    "rumble_request_firestore_writes", "Firestore writes per request.", COUNT_BUCKETS, ROUTE_LABELS)
+request_streamed = Histogram(
+    "rumble_request_firestore_streamed_documents", "Documents streamed by queries per request.",
+    COUNT_BUCKETS, ROUTE_LABELS)
+request_bytes = Histogram(
+    "rumble_request_firestore_bytes", "Approximate Firestore bytes read per request.", BYTES_BUCKETS, ROUTE_LABELS)
+token_verification = Histogram(
+    "rumble_token_verification_seconds", "ID token verification time, cache hits included.", DURATION_BUCKETS)
+outbound_http = Histogram(
+    "rumble_outbound_http_seconds", "Outbound HTTP call time (Expo push).", DURATION_BUCKETS)
+
+HISTOGRAMS = (request_duration, request_rpcs, request_reads, request_writes, request_streamed, request_bytes,
+              token_verification, outbound_http)
+
+
+class RequestStats:
+    """What one request has spent so far; updated from fan-out threads too."""
+
+    FIELDS = ("rpcs", "reads", "writes", "streamed", "bytes", "auth_seconds", "http_seconds")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, **amounts):
+        with self._lock:
+            for field, amount in amounts.items():
+                setattr(self, field, getattr(self, field) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def current_stats():
+    """Stats of the request being handled, or None outside a request."""
+    if has_request_context() and "request_stats" in g:
+        return g.request_stats
+    return None
+
+
+def _add(**amounts):
+    stats = current_stats()
+    if stats is not None:
+        stats.add(**amounts)
+
+
+@contextmanager
+def timed(histogram, field=None):
+    """Observes the block's duration, and adds it to the request's `field`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed)
+        if field:
+            _add(**{field: elapsed})
+
+
+def observe_http(response, *args, **kwargs):
+    """requests response hook: times outbound calls made through a Session."""
+    elapsed = response.elapsed.total_seconds()
+    outbound_http.observe(elapsed)
+    _add(http_seconds=elapsed)
+
+
+# ─── Firestore call counting ──────────────────────────────────────────────────
+
+_depth = threading.local()
+
+
+def document_size(value):
+    """Approximate stored size of a Firestore value, after Firestore's size rules."""
+    if isinstance(value, dict):
+        return sum(len(key) + 1 + document_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(document_size(item) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value) + 1
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    return 16  # references, geo points
+
+
+def _snapshot_size(snapshot):
+    if not getattr(snapshot, "exists", False):
+        return 0
+    data = getattr(snapshot, "_data", None)  # to_dict() deep-copies on the real client
+    return document_size(data if data is not None else snapshot.to_dict() or {})
+
+
+def _count_documents(docs, streamed):
+    """Counts documents as the caller consumes them; lists are counted at once."""
+    def count(doc):
+        _add(reads=1, streamed=1 if streamed else 0, bytes=_snapshot_size(doc))
+
+    if isinstance(docs, list):
+        for doc in docs:
+            count(doc)
+        return docs
+
+    def consume():
+        for doc in docs:
+            count(doc)
+            yield doc
+    return consume()
+
+
+def _counted(method, count, rpc=True):
+    """
+    Wraps `method` so its outermost call is passed to `count(result)`, and
+    counted as one round trip unless it only queues work (`rpc=False`).
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_depth, "value", 0)
+        _depth.value = depth + 1
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _depth.value = depth
+        if depth or current_stats() is None:
+            return result
+        if rpc:
+            _add(rpcs=1)
+        return count(result)
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _point_read(snapshot):
+    _add(reads=1, bytes=_snapshot_size(snapshot))
+    return snapshot
+
+
+def _write(result):
+    _add(writes=1)
+    return result
+
+
+def _ignore(result):
+    return result
+
+
+def _wrap(cls, name, count, rpc=True):
+    method = getattr(cls, name, None)
+    if method is not None and not getattr(method, "instrumented", False):
+        setattr(cls, name, _counted(method, count, rpc))
+
+
+def instrument_firestore(db):
+    """Counts the Firestore calls made through `db`'s classes in each request."""
+    collection = db.collection("_instrumentation")
+    document = collection.document("_probe")
+    query = collection.limit(1)
+    batch = db.batch()
+
+    _wrap(type(document), "get", _point_read)
+    for name in ("create", "set", "update", "delete"):
+        _wrap(type(document), name, _write)
+        _wrap(type(batch), name, _write, rpc=False)
+    _wrap(type(batch), "commit", _ignore)  # its writes were counted as they were queued
+    # Transactions commit through a private method, with writes queued like a batch's
+    _wrap(type(db.transaction()), "_commit", _ignore)
+    _wrap(type(collection), "add", _write)
+    _wrap(type(db), "get_all", lambda docs: _count_documents(docs, streamed=False))
+    for cls in {type(collection), type(query)}:
+        _wrap(cls, "stream", lambda docs: _count_documents(docs, streamed=True))
+    # Listing references reads no fields but is billed per document
+    _wrap(type(collection), "list_documents", lambda refs: _count_documents(refs, streamed=True))
+
+
+# ─── Middleware ───────────────────────────────────────────────────────────────
+
+def _start_request():
+    g.request_stats = RequestStats()
+    g.request_started = time.perf_counter()
+
+
+def _finish_request(response):
+    stats = current_stats()
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    labels = (request.url_rule.rule if request.url_rule else "unmatched", request.method)
+    totals = stats.as_dict()
+    request_duration.observe(elapsed, *labels)
+    request_rpcs.observe(totals["rpcs"], *labels)
+    request_reads.observe(totals["reads"], *labels)
+    request_writes.observe(totals["writes"], *labels)
+    request_streamed.observe(totals["streamed"], *labels)
+    request_bytes.observe(totals["bytes"], *labels)
+    logger.debug(
+        f"{request.method} {labels[0]} {response.status_code} {elapsed * 1000:.1f}ms "
+        f"rpcs={totals['rpcs']} reads={totals['reads']} writes={totals['writes']} streamed={totals['streamed']} "
+        f"bytes={totals['bytes']} auth={totals['auth_seconds'] * 1000:.1f}ms "
+        f"http={totals['http_seconds'] * 1000:.1f}ms"
+    )
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def render_gauges(prefix, stats):
+    """Prometheus gauges for a dict of numeric stats, e.g. a cache's stats()."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = prefix + "_" + "".join(f"_{c.lower()}" if c.isupper() else c for c in key)
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render(gauges=()):
+    """Every histogram plus the given (prefix, stats) gauge groups, as exposition text."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    for prefix, stats in gauges:
+        lines += render_gauges(prefix, stats)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,160 @@
+"""
+In-process queue for Expo push notifications.
+
+Route handlers only enqueue; a background worker drains the queue,
+coalesces pending messages into Expo batch requests (a JSON array of up to
+100 messages), and retries failed requests with exponential backoff.
+"""
+import atexit
+import queue
+import threading
+import time
+import requests
+from services.firebase_service import EXPO_PUSH_URL, HTTP_TIMEOUT, build_push_message, http_session
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Expo accepts at most 100 messages per request
+EXPO_BATCH_SIZE = 100
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30
+
+
+class PushQueue:
+    """
+    Messages enqueued by request handlers are delivered by a single daemon
+    worker thread. `url` can point at a local stub server in tests.
+    """
+
+    def __init__(self, url=EXPO_PUSH_URL, batch_size=EXPO_BATCH_SIZE,
+                 max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS, autostart=True):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.autostart = autostart
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+        self._counters = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "batches": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="push-queue", daemon=True)
+                self._worker.start()
+
+    def enqueue(self, message):
+        self._count("enqueued")
+        self._queue.put(message)
+        if self.autostart:
+            self.start()
+
+    def flush(self, timeout=None):
+        """Blocks until every queued message has been sent or given up on."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def metrics(self):
+        """Queue depth plus delivery counters."""
+        with self._counters_lock:
+            return {"depth": self._queue.qsize(), **self._counters}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Coalesce whatever else is already waiting into the same request
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._send(batch)
+            except Exception as e:
+                logger.warning(f"Push batch dropped: {e}")
+                self._count("failed", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send(self, batch):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = http_session.post(
+                    self.url,
+                    json=batch,
+                    headers={"Content-Type": "application/json"},
+                    timeout=HTTP_TIMEOUT,
+                )
+                # Rate limiting and server errors are worth retrying
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if not retryable:
+                    self._record_result(batch, response)
+                    return
+                reason = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                reason = str(e)
+
+            if attempt == self.max_attempts:
+                break
+            self._count("retries")
+            delay = min(self.backoff * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+            logger.info(f"Push batch attempt {attempt} failed ({reason}); retrying in {delay}s")
+            time.sleep(delay)
+
+        logger.warning(f"Giving up on push batch of {len(batch)} after {self.max_attempts} attempts")
+        self._count("failed", len(batch))
+
+    def _record_result(self, batch, response):
+        self._count("batches")
+        if response.status_code >= 400:
+            logger.warning(f"Expo rejected push batch: HTTP {response.status_code}")
+            self._count("failed", len(batch))
+            return
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        # Anything but {"data": [ticket, ...]} is counted as delivered, once
+        tickets = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(tickets, list):
+            tickets = []
+        failed = sum(1 for ticket in tickets if isinstance(ticket, dict) and ticket.get("status") == "error")
+        self._count("failed", failed)
+        self._count("sent", len(batch) - failed)
+
+
+# Shared per-process queue
+push_queue = PushQueue()
+atexit.register(push_queue.flush, 5)
+
+
+def enqueue_notification(token, title, body, data=None):
+    """
+    Queues a notification for background delivery
+    Args:
+        token (string): target user's notification token
+        title (string): Bold title of notification
+        body (string): text content of notification
+        data (json, optional): payload for navigation/other actions. Defaults to None.
+    """
+    push_queue.enqueue(build_push_message(token, title, body, data))
@@ -0,0 +1,405 @@
+import heapq
+import threading
+import time
+from array import array
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Single-valued profile fields, stored as dictionary-encoded int columns
+SCALAR_FIELDS = ("major", "gradYear", "userType", "careerPath")
+
+# Multi-valued profile fields, stored as per-row tuples of tag codes
+TAG_FIELDS = ("hobbies", "orgs", "interestedIndustries", "mentorshipAreas")
+
+# Profile fields that /suggested_users can filter on
+INDEXED_FIELDS = SCALAR_FIELDS + TAG_FIELDS
+
+# Points a candidate earns per overlapping value when suggestions are ranked
+SCORE_WEIGHTS = {
+    "mentorshipAreas": 3.0,
+    "interestedIndustries": 2.0,
+    "major": 2.0,
+    "hobbies": 1.0,
+    "orgs": 1.0,
+    "gradYear": 0.5,
+}
+
+# Points a ranked candidate earns for having already liked the requester,
+# shown in the score breakdown as "likedYou"
+LIKED_YOU_POINTS = 5.0
+
+# Rebuild from Firestore at least this often so writes made by other
+# worker processes eventually show up in this one.
+DEFAULT_MAX_AGE_SECONDS = 300
+
+# Attributes that make up one snapshot, swapped together on rebuild
+_SNAPSHOT_ATTRS = ("_user_ids", "_rows", "_live", "_vocab", "_bitmaps", "_scalars", "_tags")
+
+# Bit positions set in each byte value, used to walk a mask's rows
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def _terms(value):
+    """Returns the hashable values a profile field contributes to the index."""
+    if value is None:
+        return set()
+    if isinstance(value, (list, tuple, set)):
+        return {item for item in value if isinstance(item, (str, int))}
+    if isinstance(value, (str, int)):
+        return {value}
+    return set()
+
+
+def ranking_preferences(profile, filters=None):
+    """
+    Values a user's suggestions are scored against: the filters they sent,
+    falling back to their own profile for any field left empty.
+    """
+    filters = filters or {}
+    return {field: filters.get(field) or profile.get(field) for field in SCORE_WEIGHTS}
+
+
+def build_excluded_ids(user_id, user_data, liked_ids=()):
+    """
+    Users to leave out of user_id's suggestions: themself plus everyone liked
+    (`liked_ids`, or a liked_users map not yet migrated to like edges) or matched.
+    """
+    return frozenset({
+        user_id,
+        *liked_ids,
+        *(user_data or {}).get("liked_users", {}),
+        *(user_data or {}).get("matched_users", []),
+    })
+
+
+def _rows_to_mask(rows):
+    """Builds a bitmask from row numbers in one pass (no per-row big-int copies)."""
+    if not rows:
+        return 0
+    buf = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, "little")
+
+
+def iter_rows(mask):
+    """Yields the row numbers set in `mask`, in ascending order."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+class SuggestionIndex:
+    """
+    Columnar, bitset-backed snapshot of the profile fields /suggested_users filters on.
+
+    Every user gets a row number. Each field value is interned to an int code
+    per field, and every (field, code) pair owns a Python int used as a bitmask
+    over rows. A whole filter dict is then evaluated as a handful of big-int
+    AND/OR operations across all users at once, and only the surviving rows are
+    turned back into user IDs.
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._reset()
+        self._built_at = None
+        self._journal = None            # writes made while a rebuild is streaming
+
+    def _reset(self):
+        self._user_ids = []             # row -> user ID (None once removed)
+        self._rows = {}                 # user ID -> row
+        self._live = 0                  # bitmask of rows still in use
+        self._vocab = {field: {} for field in INDEXED_FIELDS}     # value -> code
+        self._bitmaps = {field: [] for field in INDEXED_FIELDS}   # code -> row mask
+        self._scalars = {field: array("i") for field in SCALAR_FIELDS}  # row -> code (-1 if unset)
+        self._tags = {field: [] for field in TAG_FIELDS}          # row -> tuple of codes
+
+    def is_stale(self):
+        built_at = self._built_at
+        return built_at is None or time.monotonic() - built_at > self.max_age
+
+    def invalidate(self):
+        """Forces the next load to rebuild the index from scratch."""
+        self._built_at = None
+
+    def _code(self, field, value):
+        vocab = self._vocab[field]
+        code = vocab.get(value)
+        if code is None:
+            code = vocab[value] = len(vocab)
+            self._bitmaps[field].append(0)
+        return code
+
+    def _encode(self, field, value):
+        """Returns the sorted tuple of codes a profile value maps to."""
+        if field in self._scalars:
+            # Single-valued fields only index scalar values
+            if not isinstance(value, (str, int)):
+                return ()
+            return (self._code(field, value),)
+        return tuple(sorted(self._code(field, term) for term in _terms(value)))
+
+    def rebuild(self, docs):
+        """
+        Replaces the index contents. The new snapshot is built off-lock and
+        swapped in, so queries keep running against the old one meanwhile.
+        Upserts and removals made while `docs` is being read are recorded and
+        replayed onto the new snapshot before the swap, so they are not lost.
+        Args:
+            docs (iterable): (user_id, user_document_dict) pairs
+        """
+        with self._lock:
+            self._journal = []
+        try:
+            fresh = SuggestionIndex(self.max_age)
+            fresh._fill(docs)
+            with self._lock:
+                for method, args in self._journal:
+                    getattr(fresh, method)(*args)
+                self.__dict__.update(
+                    {name: getattr(fresh, name) for name in _SNAPSHOT_ATTRS}
+                )
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._journal = None
+        logger.info(f"Suggestion index rebuilt with {len(self._rows)} users")
+
+    def _fill(self, docs):
+        postings = {field: [] for field in INDEXED_FIELDS}  # code -> rows
+        for user_id, user_data in docs:
+            profile = (user_data or {}).get("profile", {}) or {}
+            row = self._append_row(user_id)
+            for field in INDEXED_FIELDS:
+                codes = self._encode(field, profile.get(field))
+                self._store(field, row, codes)
+                rows_by_code = postings[field]
+                for code in codes:
+                    while len(rows_by_code) <= code:
+                        rows_by_code.append([])
+                    rows_by_code[code].append(row)
+
+        # Set all bits of each posting list at once instead of one big-int copy per row
+        for field, rows_by_code in postings.items():
+            self._bitmaps[field] = [_rows_to_mask(rows) for rows in rows_by_code]
+        self._live = _rows_to_mask(range(len(self._user_ids)))
+
+    def load(self, stream_users):
+        """
+        Builds the index on first use and keeps it fresh.
+
+        The first call blocks until a snapshot exists. Once one does, a stale
+        index is rebuilt by a single background thread while every caller
+        keeps querying the current snapshot.
+        Args:
+            stream_users (callable): returns an iterable of (user_id, user_document_dict)
+        """
+        if not self.is_stale():
+            return self
+        if self._built_at is None:
+            with self._rebuild_lock:
+                # Another thread may have built it while we waited for the lock
+                if self._built_at is None or self.is_stale():
+                    self.rebuild(stream_users())
+        elif self._rebuild_lock.acquire(blocking=False):
+            threading.Thread(
+                target=self._rebuild_in_background,
+                args=(stream_users,),
+                name="suggestion-index",
+                daemon=True,
+            ).start()
+        return self
+
+    def _rebuild_in_background(self, stream_users):
+        try:
+            if self.is_stale():
+                self.rebuild(stream_users())
+        except Exception as e:
+            logger.warning(f"Suggestion index rebuild failed: {e}")
+        finally:
+            self._rebuild_lock.release()
+
+    def _append_row(self, user_id):
+        row = len(self._user_ids)
+        self._user_ids.append(user_id)
+        self._rows[user_id] = row
+        for column in self._scalars.values():
+            column.append(-1)
+        for column in self._tags.values():
+            column.append(())
+        return row
+
+    def _store(self, field, row, codes):
+        if field in self._scalars:
+            self._scalars[field][row] = codes[0] if codes else -1
+        else:
+            self._tags[field][row] = codes
+
+    def _row_codes(self, field, row):
+        if field in self._scalars:
+            code = self._scalars[field][row]
+            return (code,) if code >= 0 else ()
+        return self._tags[field][row]
+
+    def upsert(self, user_id, profile):
+        """Re-indexes the profile fields present in `profile` (merge semantics)."""
+        profile = profile or {}
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(("upsert", (user_id, dict(profile))))
+            row = self._rows.get(user_id)
+            if row is None:
+                row = self._append_row(user_id)
+                self._live |= 1 << row
+            bit = 1 << row
+            for field in INDEXED_FIELDS:
+                if field not in profile:
+                    continue
+                bitmaps = self._bitmaps[field]
+                for code in self._row_codes(field, row):
+                    bitmaps[code] &= ~bit
+                codes = self._encode(field, profile[field])
+                self._store(field, row, codes)
+                for code in codes:
+                    bitmaps[code] |= bit
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(("remove", (user_id,)))
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            bit = 1 << row
+            for field in INDEXED_FIELDS:
+                bitmaps = self._bitmaps[field]
+                for code in self._row_codes(field, row):
+                    bitmaps[code] &= ~bit
+            # Rows are not reused until the next rebuild compacts them
+            self._user_ids[row] = None
+            self._live &= ~bit
+
+    def rows_mask(self, user_ids):
+        """Bitmask of the rows belonging to `user_ids` (unknown IDs are ignored)."""
+        with self._lock:
+            rows = self._rows
+            return _rows_to_mask([rows[uid] for uid in user_ids if uid in rows])
+
+    def match_mask(self, filters, exclude=()):
+        """
+        Returns the bitmask of rows that satisfy every filter.
+
+        Scalar filters (non-empty string or int) require an exact match.
+        Non-empty list filters require at least one overlapping value.
+        Empty filters are ignored. Users in `exclude` are masked out up
+        front, so they are never enumerated or read.
+        """
+        with self._lock:
+            mask = self._live
+            if exclude:
+                mask &= ~self.rows_mask(exclude)
+            for field, value in filters.items():
+                vocab = self._vocab.get(field)
+                if vocab is None:
+                    continue
+                bitmaps = self._bitmaps[field]
+                if (isinstance(value, str) and value) or isinstance(value, int):
+                    code = vocab.get(value)
+                    mask &= bitmaps[code] if code is not None else 0
+                elif isinstance(value, list) and value:
+                    union = 0
+                    for term in _terms(value):
+                        code = vocab.get(term)
+                        if code is not None:
+                            union |= bitmaps[code]
+                    mask &= union
+                if not mask:
+                    break
+            return mask
+
+    def user_ids(self, mask):
+        """
+        Returns the user IDs for the rows set in `mask`. The mask must come
+        from the same snapshot, so callers hold the lock across both steps.
+        """
+        with self._lock:
+            user_ids = self._user_ids
+            return [user_ids[row] for row in iter_rows(mask)]
+
+    def match_ids(self, filters, exclude=()):
+        """Returns the IDs of users that satisfy every filter, in row order."""
+        with self._lock:
+            return self.user_ids(self.match_mask(filters, exclude))
+
+    def candidates(self, filters, exclude=()):
+        """Returns the set of user IDs that satisfy every filter."""
+        return set(self.match_ids(filters, exclude))
+
+    def rank(self, preferences, k, after=None, exclude=(), boost=()):
+        """
+        Scores every live user by weighted overlap with `preferences` and
+        returns the best k as (user_id, score, breakdown) tuples.
+
+        Scores are accumulated by walking only the posting lists of the
+        preferred values, then a bounded heap keeps the top k, so the cost is
+        O(N log k) rather than a sort of every candidate. Ties are broken by
+        user ID so the order is stable.
+
+        Args:
+            preferences (dict): field -> value or list of values to reward
+            k (int): number of results
+            after (tuple, optional): (score, user_id) of the last result of
+                the previous page; only users ranked below it are returned
+            exclude (iterable, optional): user IDs to leave out; they are
+                masked out of the candidate rows before scoring
+            boost (iterable, optional): user IDs who liked the requester;
+                each earns LIKED_YOU_POINTS
+        """
+        with self._lock:
+            candidates = self._live & ~self.rows_mask(exclude) if exclude else self._live
+            breakdowns = {}  # row -> {field: points}
+            for field, value in preferences.items():
+                weight = SCORE_WEIGHTS.get(field)
+                vocab = self._vocab.get(field)
+                if not weight or vocab is None:
+                    continue
+                bitmaps = self._bitmaps[field]
+                for term in _terms(value):
+                    code = vocab.get(term)
+                    if code is None:
+                        continue
+                    for row in iter_rows(bitmaps[code] & candidates):
+                        points = breakdowns.setdefault(row, {})
+                        points[field] = points.get(field, 0) + weight
+            if boost:
+                for row in iter_rows(self.rows_mask(boost) & candidates):
+                    breakdowns.setdefault(row, {})["likedYou"] = LIKED_YOU_POINTS
+
+            after_key = (-after[0], after[1]) if after else None
+            user_ids = self._user_ids
+
+            def scored():
+                for row in iter_rows(candidates):
+                    user_id = user_ids[row]
+                    points = breakdowns.get(row, {})
+                    key = (-round(sum(points.values()), 3), user_id)
+                    if after_key is not None and key <= after_key:
+                        continue
+                    yield key, points
+
+            best = heapq.nsmallest(k, scored(), key=lambda item: item[0])
+            return [(key[1], -key[0], points) for key, points in best]
+
+    def __len__(self):
+        return len(self._rows)
+
+
+# Shared per-process index
+suggestion_index = SuggestionIndex()
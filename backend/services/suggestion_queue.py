@@ -0,0 +1,240 @@
+"""
+Precomputed, ranked suggestion queues.
+
+Each user gets a `suggestion_queues/{user_id}` document holding their top
+ranked candidates as ready-to-render summaries. /suggested_users serves
+unfiltered ranked requests from it, skipping anyone the requester has liked
+or matched since it was built, and falls back to live ranking when the
+queue is missing, expired or used up.
+
+Queues are refreshed three ways:
+  - for one user in a background thread when their profile changes
+  - for one user in a background thread when their queue is served past
+    `expiresAt` (SUGGESTION_QUEUE_MAX_AGE seconds after it was built) or
+    has nothing left to show, so new signups reach existing decks
+  - in bulk by a process-pool job over all users, meant to run from cron
+    (e.g. nightly) to keep every queue warm:
+        python -m services.suggestion_queue [workers]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from firebase_admin import firestore
+from services.firebase_service import (
+    db, LIKES_COLLECTION, build_user_summary, get_excluded_ids, get_liked_by_ids, get_user_profiles,
+    load_suggestion_index, SUMMARY_FIELDS
+)
+from services.suggestion_index import SuggestionIndex, build_excluded_ids, ranking_preferences
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUE_COLLECTION = "suggestion_queues"
+
+# Candidates kept per user
+QUEUE_LENGTH = int(os.getenv("SUGGESTION_QUEUE_LENGTH", "100"))
+
+# Seconds a queue is served before it is rebuilt on next use
+QUEUE_MAX_AGE_SECONDS = int(os.getenv("SUGGESTION_QUEUE_MAX_AGE", "21600"))
+
+# Users ranked per task handed to a worker process
+RANK_CHUNK_SIZE = 500
+
+# Firestore allows at most 500 writes per batch
+WRITE_BATCH_SIZE = 500
+
+
+def _queue_document(ranked, summaries):
+    """Queue document for a ranked list of (user_id, score, breakdown)."""
+    entries = []
+    for uid, score, breakdown in ranked:
+        if uid in summaries:
+            entry = dict(summaries[uid])
+            entry["score"] = score
+            entry["scoreBreakdown"] = breakdown
+            entries.append(entry)
+    return {
+        "entries": entries,
+        "generatedAt": firestore.SERVER_TIMESTAMP,
+        "expiresAt": time.time() + QUEUE_MAX_AGE_SECONDS,
+    }
+
+
+def get_queue_page(user_id, limit, after=None, exclude=()):
+    """
+    Serves a page from a user's precomputed queue with a single document read.
+
+    Args:
+        user_id (str): requesting user
+        limit (int): page size, or None for the whole queue
+        after (str, optional): ID of the last entry of the previous page. If
+            a refresh has since dropped it, the page restarts at the top.
+        exclude (iterable, optional): user IDs to skip, i.e. those liked or
+            matched since the queue was built
+
+    Returns:
+        (entries, last_id, has_more), or None when the queue is missing,
+        expired, or has nothing left to show, so the caller ranks live.
+    """
+    doc = db.collection(QUEUE_COLLECTION).document(user_id).get()
+    data = doc.to_dict() if doc.exists else None
+    if not data or not data.get("entries") or data.get("expiresAt", 0) < time.time():
+        return None
+
+    entries = data["entries"]
+    start = 0
+    if after:
+        ids = [entry["id"] for entry in entries]
+        if after in ids:
+            start = ids.index(after) + 1
+
+    def visible(entry):
+        return entry["id"] != user_id and entry["id"] not in exclude
+
+    page = []
+    position = start
+    while position < len(entries) and (limit is None or len(page) < limit):
+        entry = entries[position]
+        position += 1
+        if visible(entry):
+            page.append(entry)
+
+    if not page:
+        return None
+    has_more = any(visible(entry) for entry in entries[position:])
+    return page, page[-1]["id"], has_more
+
+
+def refresh_user_queue(user_id):
+    """Recomputes one user's queue from the in-process suggestion index."""
+    user_doc = db.collection("users").document(user_id).get()
+    if not user_doc.exists:
+        return False
+    user_data = user_doc.to_dict()
+
+    index = load_suggestion_index()
+    ranked = index.rank(
+        ranking_preferences(user_data.get("profile", {})),
+        QUEUE_LENGTH,
+        exclude=get_excluded_ids(user_id, user_data),
+        boost=get_liked_by_ids(user_id),
+    )
+    ranked_ids = [uid for uid, _, _ in ranked]
+    summaries = {
+        uid: build_user_summary(uid, data)
+        for uid, data in zip(ranked_ids, get_user_profiles(ranked_ids, SUMMARY_FIELDS))
+        if data is not None
+    }
+    db.collection(QUEUE_COLLECTION).document(user_id).set(_queue_document(ranked, summaries))
+    return True
+
+
+# ─── Incremental refresh on profile change ────────────────────────────────────
+
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggestion-queue")
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _refresh_pending(user_id):
+    with _pending_lock:
+        _pending.discard(user_id)
+    try:
+        refresh_user_queue(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to refresh suggestion queue for {user_id}: {e}")
+
+
+def schedule_queue_refresh(user_id):
+    """Refreshes a user's queue in the background; repeated requests are coalesced."""
+    with _pending_lock:
+        if user_id in _pending:
+            return
+        _pending.add(user_id)
+    _refresh_executor.submit(_refresh_pending, user_id)
+
+
+# ─── Bulk refresh over all users ──────────────────────────────────────────────
+
+_worker_index = None
+_worker_users = None
+
+
+def _init_worker(users):
+    """Builds a private index in each worker process."""
+    global _worker_index, _worker_users
+    _worker_users = users
+    _worker_index = SuggestionIndex()
+    _worker_index.rebuild(users.items())
+
+
+def _rank_chunk(user_ids):
+    results = []
+    for user_id in user_ids:
+        user_data = _worker_users[user_id]
+        ranked = _worker_index.rank(
+            ranking_preferences(user_data.get("profile", {})),
+            QUEUE_LENGTH,
+            exclude=build_excluded_ids(user_id, user_data),
+            boost=user_data["liked_by"],
+        )
+        results.append((user_id, ranked))
+    return results
+
+
+def refresh_all_queues(workers=None):
+    """
+    Rebuilds every user's queue. Users and like edges are each streamed
+    once, ranking is spread across a process pool, and queue documents are
+    written in batches.
+    """
+    users = {}
+    summaries = {}
+    for doc in db.collection("users").stream():
+        data = doc.to_dict() or {}
+        # Workers only need what ranking reads
+        users[doc.id] = {
+            "profile": data.get("profile", {}),
+            "liked_users": dict.fromkeys(data.get("liked_users", {}), True),
+            "matched_users": list(data.get("matched_users", [])),
+            "liked_by": [],
+        }
+        summaries[doc.id] = build_user_summary(doc.id, data)
+    for doc in db.collection(LIKES_COLLECTION).select(["liker", "likee"]).stream():
+        edge = doc.to_dict() or {}
+        liker_id, likee_id = edge.get("liker"), edge.get("likee")
+        if liker_id in users and likee_id in users:
+            users[liker_id]["liked_users"][likee_id] = True
+            users[likee_id]["liked_by"].append(liker_id)
+
+    user_ids = list(users)
+    chunks = [user_ids[i:i + RANK_CHUNK_SIZE] for i in range(0, len(user_ids), RANK_CHUNK_SIZE)]
+    written = 0
+    batch = db.batch()
+    pending = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(users,)) as pool:
+        for results in pool.map(_rank_chunk, chunks):
+            for user_id, ranked in results:
+                batch.set(
+                    db.collection(QUEUE_COLLECTION).document(user_id),
+                    _queue_document(ranked, summaries),
+                )
+                pending += 1
+                if pending == WRITE_BATCH_SIZE:
+                    batch.commit()
+                    written += pending
+                    batch = db.batch()
+                    pending = 0
+
+    if pending:
+        batch.commit()
+        written += pending
+    logger.info(f"Refreshed {written} suggestion queues")
+    return written
+
+
+if __name__ == "__main__":
+    refresh_all_queues(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,61 @@
+"""
+Per-request timing spans.
+
+Code running inside a request records named spans (`with span("read"):`, or
+through services.concurrency.gather). When the request finishes they are sent
+back in a Server-Timing header, which browser dev tools draw as a timeline,
+and logged at DEBUG with their start offsets, so overlapping calls show up as
+spans that start before the previous one ends.
+"""
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def record_span(name, start, end):
+    """Adds a span measured with time.perf_counter() to the current request."""
+    if has_request_context() and "trace_start" in g:
+        g.trace_spans.append((name, start - g.trace_start, end - start))
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, start, time.perf_counter())
+
+
+def request_spans():
+    """(name, offset, duration) in seconds for each span of the current request."""
+    return list(g.get("trace_spans", ()))
+
+
+def _start_trace():
+    g.trace_start = time.perf_counter()
+    g.trace_spans = []
+
+
+def _finish_trace(response):
+    spans = g.get("trace_spans")
+    if not spans:
+        return response
+    total = time.perf_counter() - g.trace_start
+    response.headers["Server-Timing"] = ", ".join(
+        [f'{name};dur={duration * 1000:.1f};desc="+{offset * 1000:.1f}ms"' for name, offset, duration in spans]
+        + [f"total;dur={total * 1000:.1f}"]
+    )
+    logger.debug(
+        f"{request.method} {request.path} {total * 1000:.1f}ms: "
+        + ", ".join(f"{name} +{offset * 1000:.1f}ms for {duration * 1000:.1f}ms" for name, offset, duration in spans)
+    )
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
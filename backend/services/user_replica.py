@@ -0,0 +1,383 @@
+"""
+Process-local replica of the users collection and its like edges, kept
+current by Firestore on_snapshot listeners.
+
+It holds only what /suggested_users and the signup email check read: the
+summary card fields, the indexed profile fields, the email, the matched
+user IDs, and who liked whom. Each user is a single tuple in REPLICA_FIELDS
+order, and the likes they gave and received are one tuple of IDs each.
+Lists are stored as tuples, and repeated values (majors, tags, names, user
+IDs) are interned so every user shares one copy of them.
+
+A user who gave and received about 20 likes takes about 1.6 KB, so the
+default cap of USER_REPLICA_MAX_MB (1024) holds around 650,000 users. A
+replica that outgrows the cap drops its contents and stops listening, and
+callers go back to reading Firestore, as they do before the first snapshots
+arrive.
+The cap covers the replica only; the Firestore client's listeners keep
+their own copy of each listened document.
+
+Enabled with USER_REPLICA=1.
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from services.suggestion_index import INDEXED_FIELDS, suggestion_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+USER_REPLICA_ENABLED = os.getenv("USER_REPLICA") == "1"
+USER_REPLICA_MAX_BYTES = int(float(os.getenv("USER_REPLICA_MAX_MB", "1024")) * 1024 * 1024)
+
+# Fields kept per user, in record order; covers firebase_service.SUMMARY_FIELDS
+REPLICA_FIELDS = (
+    "settings.email", "settings.firstName", "settings.lastName", "settings.ethnicity",
+    "settings.gender", "settings.pronouns", "profile.bio", "profile.major", "profile.gradYear",
+    "profile.hobbies", "profile.orgs", "profile.careerPath", "profile.interestedIndustries",
+    "profile.mentorshipAreas", "profile.userType", "matched_users",
+)
+_POSITION = {field: i for i, field in enumerate(REPLICA_FIELDS)}
+_EMAIL = _POSITION["settings.email"]
+_MATCHED = _POSITION["matched_users"]
+
+# Values unique to one user; interning them would only grow the intern table
+_UNSHARED_FIELDS = {"settings.email", "profile.bio"}
+
+# Approximate cost of one entry in the replica's dicts
+_ENTRY_OVERHEAD = 200
+
+
+def _email_key(email):
+    # Same normalization as firebase_service.normalize_email
+    return (email or "").strip().lower()
+
+
+def _compact(value, shared):
+    if isinstance(value, str):
+        return sys.intern(value) if shared else value
+    if isinstance(value, (list, tuple)):
+        return tuple(_compact(item, shared) for item in value)
+    return value
+
+
+def _field(data, path):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        data = data.get(key)
+        if not isinstance(data, dict):
+            return None
+    return data.get(leaf)
+
+
+def _record(data):
+    return tuple(_compact(_field(data, path), path not in _UNSHARED_FIELDS) for path in REPLICA_FIELDS)
+
+
+def _record_size(record):
+    """Bytes a record adds to the replica; shared (interned) values count once per pointer."""
+    size = _ENTRY_OVERHEAD + sys.getsizeof(record)
+    for path, value in zip(REPLICA_FIELDS, record):
+        if path in _UNSHARED_FIELDS and isinstance(value, str):
+            size += sys.getsizeof(value)
+        elif isinstance(value, tuple):
+            size += sys.getsizeof(value)
+    return size
+
+
+def _ids_size(ids):
+    return _ENTRY_OVERHEAD + sys.getsizeof(ids) if ids else 0
+
+
+def _edge(change):
+    edge = change.document.to_dict() or {}
+    return edge.get("liker"), edge.get("likee")
+
+
+class UserReplica:
+    """
+    In-memory copy of the users collection and the likes between them.
+    Listener threads apply changes under a lock; readers see whole records
+    and ID tuples, which are immutable.
+    """
+
+    def __init__(self, max_bytes=USER_REPLICA_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._watches = []
+        self._listening = False
+        self._reset()
+        self.overflowed = False
+
+    def _reset(self):
+        self._users = {}                # user ID -> record tuple
+        self._emails = {}               # normalized email -> user ID
+        self._liked = {}                # liker ID -> tuple of likee IDs
+        self._liked_by = {}             # likee ID -> tuple of liker IDs
+        self._likes = 0
+        self._bytes = 0
+        self._events = 0
+        self._loading = set()           # listeners still waiting for their first snapshot
+        self._read_time = None          # read time of the last snapshot applied
+        self._lag = 0.0                 # seconds between that read time and applying it
+        self.ready = False
+
+    def start(self, users, likes=None):
+        """
+        Starts listening to the `users` collection and, if given, the `likes`
+        edge collection; the replica is ready once every first snapshot is in.
+        """
+        with self._lock:
+            if self._listening:
+                return
+            self._reset()
+            self._listening = True
+            self.overflowed = False
+            listeners = [("users", users, self._on_users)]
+            if likes is not None:
+                listeners.append(("likes", likes, self._on_likes))
+            self._loading = {name for name, _, _ in listeners}
+        watches = [collection.on_snapshot(callback) for _, collection, callback in listeners]
+        with self._lock:
+            if self._listening:
+                self._watches, watches = watches, []
+        for watch in watches:
+            # Overflowed or stopped before on_snapshot returned
+            watch.unsubscribe()
+
+    def stop(self):
+        with self._lock:
+            watches, self._watches = self._watches, []
+            self._listening = False
+            self._reset()
+        for watch in watches:
+            watch.unsubscribe()
+
+    def _applied(self, name, changes, read_time):
+        """Bookkeeping after a snapshot; returns whether it was that listener's first."""
+        initial = name in self._loading
+        self._loading.discard(name)
+        self._events += len(changes)
+        self._read_time = read_time
+        self._lag = max(0.0, time.time() - read_time.timestamp()) if read_time else 0.0
+        if not self.ready and not self._loading:
+            self.ready = True
+            logger.info(f"User replica loaded {len(self._users)} users and {self._likes} likes "
+                        f"({self._bytes / 1e6:.1f} MB)")
+        return initial
+
+    def _on_users(self, docs, changes, read_time):
+        with self._lock:
+            if not self._listening:
+                return
+            updated, removed = [], []
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._remove(doc.id)
+                    removed.append(doc.id)
+                else:
+                    updated.append((doc.id, self._put(doc.id, doc.to_dict() or {})))
+                if self._bytes > self.max_bytes:
+                    self._overflow()
+                    return
+            initial = self._applied("users", changes, read_time)
+
+        if initial:
+            # The next load rebuilds the suggestion index from memory
+            suggestion_index.invalidate()
+            return
+        for user_id, record in updated:
+            suggestion_index.upsert(user_id, self._index_fields(record))
+        for user_id in removed:
+            suggestion_index.remove(user_id)
+
+    def _on_likes(self, docs, changes, read_time):
+        with self._lock:
+            if not self._listening:
+                return
+            if "likes" in self._loading:
+                # Grouped first so each user's tuples are built once
+                liked, liked_by = {}, {}
+                for change in changes:
+                    liker_id, likee_id = _edge(change)
+                    if liker_id and likee_id:
+                        liked.setdefault(liker_id, []).append(likee_id)
+                        liked_by.setdefault(likee_id, []).append(liker_id)
+                for index, grouped in ((self._liked, liked), (self._liked_by, liked_by)):
+                    for user_id, other_ids in grouped.items():
+                        self._set_ids(index, user_id, other_ids)
+                        if self._bytes > self.max_bytes:
+                            self._overflow()
+                            return
+            else:
+                for change in changes:
+                    liker_id, likee_id = _edge(change)
+                    if not (liker_id and likee_id):
+                        continue
+                    if change.type.name == "REMOVED":
+                        self._drop_like(liker_id, likee_id)
+                    else:
+                        self._add_like(liker_id, likee_id)
+                if self._bytes > self.max_bytes:
+                    self._overflow()
+                    return
+            self._applied("likes", changes, read_time)
+
+    def _put(self, user_id, data):
+        record = _record(data)
+        self._remove(user_id)
+        user_id = sys.intern(user_id)
+        self._users[user_id] = record
+        if record[_EMAIL]:
+            self._emails[_email_key(record[_EMAIL])] = user_id
+        self._bytes += _record_size(record)
+        return record
+
+    def _remove(self, user_id):
+        record = self._users.pop(user_id, None)
+        if record is None:
+            return
+        email = _email_key(record[_EMAIL])
+        if self._emails.get(email) == user_id:
+            del self._emails[email]
+        self._bytes -= _record_size(record)
+
+    def _set_ids(self, index, user_id, other_ids):
+        """Stores one user's likes given (index is _liked) or received (_liked_by)."""
+        old = index.get(user_id, ())
+        other_ids = tuple(sys.intern(uid) for uid in other_ids)
+        if other_ids:
+            index[sys.intern(user_id)] = other_ids
+        else:
+            index.pop(user_id, None)
+        if index is self._liked:
+            self._likes += len(other_ids) - len(old)
+        self._bytes += _ids_size(other_ids) - _ids_size(old)
+
+    def _add_like(self, liker_id, likee_id):
+        liked = self._liked.get(liker_id, ())
+        if likee_id not in liked:
+            self._set_ids(self._liked, liker_id, liked + (likee_id,))
+            self._set_ids(self._liked_by, likee_id, self._liked_by.get(likee_id, ()) + (liker_id,))
+
+    def _drop_like(self, liker_id, likee_id):
+        liked = self._liked.get(liker_id, ())
+        if likee_id in liked:
+            self._set_ids(self._liked, liker_id, (uid for uid in liked if uid != likee_id))
+            self._set_ids(self._liked_by, likee_id,
+                          (uid for uid in self._liked_by.get(likee_id, ()) if uid != liker_id))
+
+    def _overflow(self):
+        logger.warning(
+            f"User replica passed {self.max_bytes / 1e6:.0f} MB at {len(self._users)} users; "
+            f"falling back to Firestore reads"
+        )
+        watches, self._watches = self._watches, []
+        self._listening = False
+        self._reset()
+        self.overflowed = True
+        for watch in watches:
+            # Not from a listener's own thread, which unsubscribe joins
+            threading.Thread(target=watch.unsubscribe, daemon=True).start()
+
+    def _index_fields(self, record):
+        return {field: record[_POSITION[f"profile.{field}"]] for field in INDEXED_FIELDS}
+
+    # ─── Reads ────────────────────────────────────────────────────────────────
+
+    def get(self, user_id):
+        """The replicated fields of a user, shaped like their document, or None."""
+        record = self._users.get(user_id)
+        if record is None:
+            return None
+        data = {"settings": {}, "profile": {}}
+        for path, value in zip(REPLICA_FIELDS, record):
+            if value is None:
+                continue
+            if isinstance(value, tuple):
+                value = list(value)
+            section, _, key = path.partition(".")
+            if key:
+                data[section][key] = value
+            else:
+                data[section] = value
+        data["liked_users"] = dict.fromkeys(self._liked.get(user_id, ()), True)
+        return data
+
+    def liked_ids(self, user_id):
+        """IDs of the users `user_id` has liked."""
+        return list(self._liked.get(user_id, ()))
+
+    def liked_by_ids(self, user_id):
+        """IDs of the users who have liked `user_id`."""
+        return list(self._liked_by.get(user_id, ()))
+
+    def has_email(self, email):
+        return _email_key(email) in self._emails
+
+    def documents(self):
+        """(user_id, {"profile": ...}) for every user, as the suggestion index is built from."""
+        with self._lock:
+            items = list(self._users.items())
+        for user_id, record in items:
+            yield user_id, {"profile": self._index_fields(record)}
+
+    # ─── Local writes ─────────────────────────────────────────────────────────
+    # Applied as soon as this process writes them, so its next read sees them
+    # even before the listener delivers the change.
+
+    def _set_matched(self, user_id, matched_ids):
+        record = self._users.get(user_id)
+        if record is not None:
+            self._bytes -= _record_size(record)
+            record = record[:_MATCHED] + (tuple(matched_ids),) + record[_MATCHED + 1:]
+            self._users[user_id] = record
+            self._bytes += _record_size(record)
+
+    def note_like(self, user_id, liked_id, matched=False):
+        with self._lock:
+            if not self.ready:
+                return
+            self._add_like(user_id, liked_id)
+            if matched:
+                for a, b in ((user_id, liked_id), (liked_id, user_id)):
+                    record = self._users.get(a)
+                    if record is not None and b not in (record[_MATCHED] or ()):
+                        self._set_matched(a, (*(record[_MATCHED] or ()), sys.intern(b)))
+
+    def note_unmatch(self, user_id, other_id):
+        with self._lock:
+            if not self.ready:
+                return
+            for a, b in ((user_id, other_id), (other_id, user_id)):
+                self._drop_like(a, b)
+                record = self._users.get(a)
+                if record is not None:
+                    self._set_matched(a, (uid for uid in record[_MATCHED] or () if uid != b))
+
+    def stats(self):
+        read_time = self._read_time
+        return {
+            "ready": int(self.ready),
+            "overflowed": int(self.overflowed),
+            "users": len(self._users),
+            "likes": self._likes,
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "events": self._events,
+            # Delivery delay of the last snapshot applied
+            "lagSeconds": round(self._lag, 3),
+            # Time since then; grows on an idle collection too
+            "stalenessSeconds": round(
+                (datetime.now(timezone.utc) - read_time).total_seconds(), 3) if read_time else -1,
+        }
+
+    def __len__(self):
+        return len(self._users)
+
+
+# Shared per-process replica
+user_replica = UserReplica()
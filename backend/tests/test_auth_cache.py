@@ -0,0 +1,54 @@
+# Verified-token cache in services.auth_service
+
+import threading
+import time
+
+import services.auth_service as auth_service
+
+
+def _fake_verifier(monkeypatch, exp_in=60, delay=0.0):
+    calls = []
+
+    def verify_id_token(token):
+        calls.append(token)
+        time.sleep(delay)
+        return {"uid": f"uid_{token}", "exp": time.time() + exp_in}
+
+    monkeypatch.setattr(auth_service.auth, "verify_id_token", verify_id_token, raising=False)
+    auth_service.token_cache.clear()
+    return calls
+
+
+def test_repeat_token_verified_once(monkeypatch):
+    calls = _fake_verifier(monkeypatch)
+    hits_before = auth_service.token_cache.hits
+
+    first = auth_service.verify_id_token_cached("token_a")
+    second = auth_service.verify_id_token_cached("token_a")
+
+    assert first == second and first["uid"] == "uid_token_a"
+    assert calls == ["token_a"]
+    assert auth_service.token_cache.hits == hits_before + 1
+
+
+def test_expired_token_not_cached(monkeypatch):
+    calls = _fake_verifier(monkeypatch, exp_in=-1)
+    auth_service.verify_id_token_cached("token_b")
+    auth_service.verify_id_token_cached("token_b")
+    assert calls == ["token_b", "token_b"]
+
+
+def test_concurrent_requests_share_one_verification(monkeypatch):
+    calls = _fake_verifier(monkeypatch, delay=0.05)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(auth_service.verify_id_token_cached("token_c")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["token_c"]
+    assert len(results) == 8 and all(r["uid"] == "uid_token_c" for r in results)
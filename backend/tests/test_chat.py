@@ -6,6 +6,8 @@ Chat feature tests
 T081 – Mentee responds in that chat
 T082 – Chat history persists after “logout / login”
 """
+import time
+
 import pytest
 import tests.mock_firebase as mock_firebase  # gives access to the in‑memory Firestore
 from services.firebase_service import get_convo_id  # deterministic conversation ID  :contentReference[oaicite:0]{index=0}&#8203;:contentReference[oaicite:1]{index=1}
@@ -75,3 +77,133 @@ def test_t082_chat_history_persists_after_relogin(client):
     assert "History check 1" in texts and "History check 2" in texts
     assert len(history) >= 2, "Chat history should not be lost"
 
+
+
+# ---------- Ordered, paged and incremental history ----------
+def _add_message(messages, text):
+    from firebase_admin import firestore
+    messages.add({"text": text, "sender_id": "chat_a", "timestamp": firestore.SERVER_TIMESTAMP})
+
+
+@pytest.fixture
+def chat_pair(mock_firestore):
+    """Two matched users with five messages between them, oldest first."""
+    users = mock_firestore.collection("users")
+    users.document("chat_a").set({"uid": "chat_a", "matched_users": ["chat_b"]})
+    users.document("chat_b").set({"uid": "chat_b", "matched_users": ["chat_a"]})
+    messages = mock_firestore.collection("conversations").document(get_convo_id("chat_a", "chat_b")).collection("messages")
+    messages._docs.clear()
+    for i in range(5):
+        _add_message(messages, f"m{i}")
+    yield [doc.id for doc in messages.order_by("timestamp").stream()]
+    for uid in ("chat_a", "chat_b"):
+        users._docs.pop(uid)
+
+
+def _conversation(client, **params):
+    res = client.get(
+        "/api/conversation",
+        query_string={"targetID": "chat_b", **params},
+        headers={"Authorization": "Bearer chat_a"},
+    )
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_history_is_ordered_and_carries_timestamps(client, chat_pair):
+    body = _conversation(client)
+    assert [m["text"] for m in body["messages"]] == ["m0", "m1", "m2", "m3", "m4"]
+    assert all(m["timestamp"] for m in body["messages"])
+    assert body["nextBefore"] is None
+
+
+def test_history_pages_back_with_before(client, chat_pair):
+    newest = _conversation(client, limit=2)
+    assert [m["text"] for m in newest["messages"]] == ["m3", "m4"]
+
+    older = _conversation(client, limit=2, before=newest["nextBefore"])
+    assert [m["text"] for m in older["messages"]] == ["m1", "m2"]
+
+    oldest = _conversation(client, limit=2, before=older["nextBefore"])
+    assert [m["text"] for m in oldest["messages"]] == ["m0"]
+    assert oldest["nextBefore"] is None
+
+
+def test_since_returns_only_new_messages(client, chat_pair):
+    assert [m["text"] for m in _conversation(client, since=chat_pair[2])["messages"]] == ["m3", "m4"]
+
+    latest = _conversation(client)["messages"][-1]
+    assert _conversation(client, since=latest["timestamp"])["messages"] == []
+    assert [m["text"] for m in _conversation(client, since="0")["messages"]][:1] == ["m0"]
+
+
+# ---------- Streaming ----------
+def test_broker_fans_out_to_every_subscriber_of_a_channel():
+    from services.chat_events import InMemoryBroker
+
+    broker = InMemoryBroker()
+    first, second, other = broker.subscribe("c1"), broker.subscribe("c1"), broker.subscribe("c2")
+    broker.publish("c1", {"id": "m1"})
+    assert first.get(0) == second.get(0) == {"id": "m1"}
+    assert other.get(0) is None
+
+    first.close()
+    assert broker.subscriber_count() == 2
+
+
+def test_stream_delivers_messages_as_they_are_sent(client, chat_pair, monkeypatch):
+    import routes.match_routes as match_routes
+    from services.chat_events import broker
+
+    monkeypatch.setattr(match_routes, "CHAT_STREAM_HEARTBEAT_SECONDS", 0.01)
+    res = client.get(
+        "/api/conversation/stream",
+        query_string={"targetID": "chat_b"},
+        headers={"Authorization": "Bearer chat_a"},
+    )
+    assert res.status_code == 200 and res.mimetype == "text/event-stream"
+    events = (chunk.decode() for chunk in res.response)
+    assert next(events).startswith("retry:")
+
+    sent = client.post(
+        "/api/message",
+        json={"targetID": "chat_a", "message": "live"},
+        headers={"Authorization": "Bearer chat_b"},
+    ).get_json()
+    event = next(events)
+    assert event.startswith(f"id: {sent['messageID']}\nevent: message\n")
+    assert '"text": "live"' in event
+    assert next(events) == ": keep-alive\n\n"
+
+    res.close()
+    assert broker.subscriber_count() == 0
+
+
+def _server_timing(response):
+    spans = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        values = dict(param.split("=", 1) for param in params)
+        offset = float(values["desc"].strip('"+ms')) if "desc" in values else 0.0
+        spans[name] = (offset, float(values["dur"]))
+    return spans
+
+
+def test_message_reads_overlap(client, chat_pair, monkeypatch):
+    import mock_firebase
+
+    real_get = mock_firebase.MockFirestoreDocument.get
+
+    def slow_get(self, *args, **kwargs):
+        time.sleep(0.05)
+        return real_get(self, *args, **kwargs)
+
+    monkeypatch.setattr(mock_firebase.MockFirestoreDocument, "get", slow_get)
+    res = client.post("/api/message", json={"targetID": "chat_b", "message": "hi"},
+                      headers={"Authorization": "Bearer chat_a"})
+    assert res.status_code == 200
+
+    spans = _server_timing(res)
+    (sender_at, sender_ms), (target_at, target_ms) = spans["read_sender"], spans["read_target"]
+    assert target_at < sender_at + sender_ms and sender_at < target_at + target_ms
+    assert spans["total"][1] < sender_ms + target_ms
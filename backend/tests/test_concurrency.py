@@ -0,0 +1,36 @@
+# Request-scoped fan-out in services.concurrency
+
+import time
+
+import pytest
+
+from services.concurrency import gather
+
+
+def _sleep_then(value, seconds=0.1):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+
+def test_calls_overlap_and_keep_their_order():
+    start = time.perf_counter()
+    results = gather(("a", _sleep_then("a")), ("b", _sleep_then("b")), ("c", _sleep_then("c")))
+    assert results == ["a", "b", "c"]
+    assert time.perf_counter() - start < 0.25
+
+
+def test_first_error_is_raised_after_every_call_finished():
+    finished = []
+
+    def fail():
+        raise KeyError("boom")
+
+    def slow():
+        time.sleep(0.05)
+        finished.append("slow")
+
+    with pytest.raises(KeyError):
+        gather(("fail", fail), ("slow", slow))
+    assert finished == ["slow"]
@@ -66,3 +66,247 @@ def test_T086_reset_filters_returns_all(client):
     assert len(reset_users) >= narrow_count
     ids = {u["id"] for u in reset_users}
     assert {"user_1", "user_2"}.issubset(ids)
+
+
+# ---------------------------------------------------------------------------
+# Suggestion index
+# ---------------------------------------------------------------------------
+
+def test_list_filter_matches_any_value(client):
+    """A list filter is a union: users with any of the values are returned."""
+    resp = _post_suggested(client, {"hobbies": ["Hiking", "Gaming"]})
+    assert resp.status_code == HTTPStatus.OK
+    assert {u["id"] for u in resp.get_json()["users"]} == {"user_1", "user_2"}
+
+
+def test_index_follows_profile_writes(client):
+    """Upserts and removals on the index are reflected without a rebuild."""
+    from services.firebase_service import load_suggestion_index
+
+    index = load_suggestion_index()
+    index.upsert("user_2", {"careerPath": "Software Engineer"})
+    resp = _post_suggested(client, {"careerPath": "Software Engineer"})
+    assert {u["id"] for u in resp.get_json()["users"]} == {"user_1", "user_2"}
+
+    index.remove("user_1")
+    resp = _post_suggested(client, {"careerPath": "Software Engineer"})
+    assert {u["id"] for u in resp.get_json()["users"]} == {"user_2"}
+
+
+def test_pagination_walks_all_users_once(client):
+    """limit/cursor pages are ordered by ID and cover every user exactly once."""
+    first = _post_suggested(client, {"limit": 1}).get_json()
+    assert [u["id"] for u in first["users"]] == ["user_1"]
+    assert first["nextCursor"]
+
+    seen = [u["id"] for u in first["users"]]
+    cursor = first["nextCursor"]
+    while cursor:
+        page = _post_suggested(client, {"limit": 1, "cursor": cursor}).get_json()
+        seen += [u["id"] for u in page["users"]]
+        cursor = page["nextCursor"]
+    assert len(seen) == len(set(seen)) and {"user_1", "user_2"}.issubset(seen)
+
+
+def test_invalid_cursor_rejected(client):
+    resp = _post_suggested(client, {"cursor": "not-a-cursor"})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_ranked_cursor_with_non_numeric_score_rejected(client):
+    import base64, json
+
+    cursor = base64.urlsafe_b64encode(json.dumps({"after": "user_1", "score": "high"}).encode()).decode()
+    resp = _post_suggested(client, {"rank": True, "hobbies": ["Hiking"], "cursor": cursor})
+    assert resp.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_bitset_index_agrees_with_legacy_loop():
+    """The bitset index returns exactly what the old per-document loop did."""
+    from benchmarks.bench_suggestion_filters import FILTERS, legacy_filter, synthetic_users
+    from services.suggestion_index import SuggestionIndex
+
+    docs = list(synthetic_users(500))
+    index = SuggestionIndex()
+    index.rebuild(docs)
+    index.remove(docs[0][0])
+    index.upsert(docs[1][0], {"userType": "mentor", "hobbies": ["Hobby 0"]})
+    docs = docs[1:]
+    docs[0][1]["profile"].update({"userType": "mentor", "hobbies": ["Hobby 0"]})
+
+    for _, raw_filters in FILTERS:
+        assert index.candidates(raw_filters) == set(legacy_filter(docs, raw_filters))
+
+
+def test_ranked_mode_scores_instead_of_filtering(client):
+    """rank=true orders by weighted overlap and keeps non-matching users."""
+    resp = _post_suggested(client, {"rank": True, "hobbies": ["Hiking"], "interestedIndustries": ["Tech"]})
+    assert resp.status_code == HTTPStatus.OK
+    users = resp.get_json()["users"]
+
+    assert users[0]["id"] == "user_1"
+    assert users[0]["score"] == 3.0
+    assert users[0]["scoreBreakdown"] == {"hobbies": 1.0, "interestedIndustries": 2.0}
+    assert "user_2" in {u["id"] for u in users}
+    scores = [u["score"] for u in users]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_ranked_pages_follow_the_full_ranking(client):
+    payload = {"rank": True, "hobbies": ["Hiking"]}
+    full = [u["id"] for u in _post_suggested(client, payload).get_json()["users"]]
+
+    paged, cursor = [], None
+    while True:
+        page = _post_suggested(client, {**payload, "limit": 1, "cursor": cursor}).get_json()
+        paged += [u["id"] for u in page["users"]]
+        cursor = page["nextCursor"]
+        if not cursor:
+            break
+    assert paged == full
+
+
+def test_unfiltered_ranked_deck_served_from_queue(client, mock_firestore):
+    """A precomputed queue serves the deck and skips users liked since it was built."""
+    from services.suggestion_queue import QUEUE_COLLECTION, refresh_user_queue
+
+    assert refresh_user_queue("user_3")
+    queued = mock_firestore.collection(QUEUE_COLLECTION).document("user_3").get().to_dict()
+    assert {"user_1", "user_2"}.issubset({e["id"] for e in queued["entries"]})
+
+    from services.firebase_service import like_edge, like_ref
+    like = like_ref("user_3", "user_2")
+    like.set(like_edge("user_3", "user_2"))
+    try:
+        users = _post_suggested(client, {"rank": True}).get_json()["users"]
+        ids = {u["id"] for u in users}
+        assert "user_1" in ids and "user_2" not in ids and "user_3" not in ids
+    finally:
+        like.delete()
+        mock_firestore.collection(QUEUE_COLLECTION).document("user_3").delete()
+
+
+@pytest.mark.parametrize("queue_doc", [
+    # Every queued user has been liked since the queue was built
+    {"entries": [{"id": "user_2"}], "expiresAt": float("inf")},
+    # Built long ago
+    {"entries": [{"id": "user_1"}, {"id": "user_2"}], "expiresAt": 0},
+])
+def test_used_up_or_expired_queue_falls_back_to_live_ranking(client, mock_firestore, monkeypatch, queue_doc):
+    import routes.match_routes as match_routes
+    from services.suggestion_queue import QUEUE_COLLECTION
+
+    from services.firebase_service import like_edge, like_ref
+
+    refreshed = []
+    monkeypatch.setattr(match_routes, "schedule_queue_refresh", refreshed.append)
+    mock_firestore.collection(QUEUE_COLLECTION).document("user_3").set(queue_doc)
+    like = like_ref("user_3", "user_2")
+    like.set(like_edge("user_3", "user_2"))
+    try:
+        body = _post_suggested(client, {"rank": True}).get_json()
+        assert [u["id"] for u in body["users"]] == ["user_1"]
+        assert "score" in body["users"][0]
+        assert refreshed == ["user_3"]
+    finally:
+        like.delete()
+        mock_firestore.collection(QUEUE_COLLECTION).document("user_3").delete()
+
+
+def test_queue_cursor_restarts_after_refresh(mock_firestore):
+    """A cursor pointing at an entry a refresh dropped restarts at the top of the new queue."""
+    from services.suggestion_queue import QUEUE_COLLECTION, get_queue_page
+
+    mock_firestore.collection(QUEUE_COLLECTION).document("user_3").set({
+        "entries": [{"id": "user_1"}, {"id": "user_2"}],
+        "expiresAt": float("inf"),
+    })
+    try:
+        page, last_id, has_more = get_queue_page("user_3", 1, after="gone", exclude={"user_1"})
+        assert [e["id"] for e in page] == ["user_2"] and last_id == "user_2" and not has_more
+    finally:
+        mock_firestore.collection(QUEUE_COLLECTION).document("user_3").delete()
+
+
+def test_user_matched_through_swipe_is_excluded(client, mock_firestore):
+    """A match made through /swipe drops the user from the next deck without any cache step."""
+    from services.firebase_service import like_edge, like_ref
+
+    users = mock_firestore.collection("users")
+    before = {u["id"] for u in _post_suggested(client).get_json()["users"]}
+    assert "user_1" in before
+
+    like_ref("user_1", "user_3").set(like_edge("user_1", "user_3"))
+    try:
+        resp = client.post("/api/swipe", json={"swipedID": "user_1"}, headers={"Authorization": "Bearer user_3"})
+        assert resp.get_json()["match"] is True
+
+        for payload in ({}, {"rank": True, "hobbies": ["Hiking"]}):
+            ids = {u["id"] for u in _post_suggested(client, payload).get_json()["users"]}
+            assert "user_1" not in ids and "user_2" in ids
+    finally:
+        users.document("user_1").set({"matched_users": ["user_2"]}, merge=True)
+        users.document("user_3").set({"matched_users": []}, merge=True)
+        like_ref("user_1", "user_3").delete()
+        like_ref("user_3", "user_1").delete()
+
+
+def test_writes_during_rebuild_survive_the_swap():
+    """Upserts and removals made while a rebuild streams are replayed onto the new snapshot."""
+    from services.suggestion_index import SuggestionIndex
+
+    index = SuggestionIndex()
+    index.rebuild([("a", {"profile": {"major": "Math"}}), ("b", {"profile": {"major": "Math"}})])
+
+    def stream():
+        yield "a", {"profile": {"major": "Math"}}
+        # Profile edit and account deletion land mid-stream
+        index.upsert("a", {"major": "Physics"})
+        index.remove("b")
+        yield "b", {"profile": {"major": "Math"}}
+
+    index.rebuild(stream())
+    assert index.candidates({"major": "Physics"}) == {"a"}
+    assert index.candidates({"major": "Math"}) == set()
+
+
+def test_stale_index_keeps_serving_while_rebuilding():
+    """A stale index answers from its current snapshot while one thread rebuilds it."""
+    import threading
+    from services.suggestion_index import SuggestionIndex
+
+    index = SuggestionIndex(max_age=0)
+    index.load(lambda: [("a", {"profile": {"major": "Math"}})])
+    release, calls = threading.Event(), []
+
+    def slow_stream():
+        calls.append(1)
+        release.wait(5)
+        return [("b", {"profile": {"major": "Math"}})]
+
+    # Neither call waits on the stream; only one rebuild is started
+    assert index.load(slow_stream).candidates({"major": "Math"}) == {"a"}
+    assert index.load(slow_stream).candidates({"major": "Math"}) == {"a"}
+    release.set()
+    with index._rebuild_lock:
+        pass
+    assert calls == [1]
+    assert index.candidates({"major": "Math"}) == {"b"}
+
+
+def test_missing_limit_returns_every_match(client, mock_firestore):
+    """Clients that never send `limit` still get the whole deck in one response."""
+    from services.firebase_service import suggestion_index
+
+    users = mock_firestore.collection("users")
+    extra = [f"user_extra_{i:03d}" for i in range(120)]
+    for uid in extra:
+        users.document(uid).set({"uid": uid, "profile": {"major": "Undeclared"}})
+    suggestion_index.invalidate()
+    try:
+        body = _post_suggested(client, {"major": "Undeclared"}).get_json()
+        assert [u["id"] for u in body["users"]] == extra
+        assert body["nextCursor"] is None
+    finally:
+        for uid in extra:
+            users._docs.pop(uid)
@@ -0,0 +1,103 @@
+# GET /matches reads every match with one batched, projected read
+
+
+def _get_matches(client, user):
+    res = client.get("/api/matches", headers={"Authorization": f"Bearer {user}"})
+    assert res.status_code == 200
+    return res.get_json()["matches"]
+
+
+def test_matches_return_card_fields_only(client, mock_firestore):
+    before = getattr(mock_firestore, "get_all_calls", 0)
+    matches = _get_matches(client, "user_1")
+
+    assert mock_firestore.get_all_calls - before == 1
+    assert matches == [{
+        "id": "user_2",
+        "settings": {"firstName": "Bob", "lastName": "Johnson"},
+        "profile": {"profilePictureUrl": "https://example.com/user2.jpg"},
+    }]
+
+
+def test_get_user_profiles_chunks_and_keeps_order(mock_firestore, monkeypatch):
+    import services.firebase_service as firebase_service
+
+    monkeypatch.setattr(firebase_service, "GET_ALL_CHUNK_SIZE", 2)
+    before = getattr(mock_firestore, "get_all_calls", 0)
+    ids = ["user_3", "missing_user", "user_1", "user_2"]
+    mock_firestore.collection("users").document("missing_user").delete()
+    try:
+        profiles = firebase_service.get_user_profiles(ids, ["settings.firstName"])
+    finally:
+        mock_firestore.collection("users")._docs.pop("missing_user", None)
+
+    assert mock_firestore.get_all_calls - before == 2
+    assert profiles == [
+        {"settings": {"firstName": "Charlie"}},
+        None,
+        {"settings": {"firstName": "Alice"}},
+        {"settings": {"firstName": "Bob"}},
+    ]
+
+
+def _matched_pair(mock_firestore, messages):
+    from services.firebase_service import get_convo_id, like_edge, like_ref
+
+    users = mock_firestore.collection("users")
+    users.document("del_a").set({"uid": "del_a", "matched_users": ["del_b", "user_3"], "liked_users.del_b": True})
+    users.document("del_b").set({"uid": "del_b", "matched_users": ["del_a"], "liked_users.del_a": True})
+    like_ref("del_b", "del_a").set(like_edge("del_b", "del_a"))
+    convo = mock_firestore.collection("conversations").document(get_convo_id("del_a", "del_b"))
+    convo.set({"participants": ["del_a", "del_b"]})
+    for i in range(messages):
+        convo.collection("messages").add({"text": f"m{i}", "sender_id": "del_a"})
+    return users, convo
+
+
+def test_delete_match_batches_message_deletes(client, mock_firestore, monkeypatch):
+    import services.firebase_service as firebase_service
+    from services.firebase_service import like_ref
+
+    monkeypatch.setattr(firebase_service, "DELETE_BATCH_SIZE", 3)
+    users, convo = _matched_pair(mock_firestore, messages=7)
+    batches_before = getattr(mock_firestore, "batches", 0)
+    try:
+        res = client.post("/api/delete_match", json={"targetID": "del_b"}, headers={"Authorization": "Bearer del_a"})
+        assert res.status_code == 200
+
+        # One batch for both user updates, three for seven messages
+        assert mock_firestore.batches - batches_before == 4
+        assert convo.collection("messages").list_documents() == []
+        assert not convo.exists
+        assert users.document("del_a").to_dict()["matched_users"] == ["user_3"]
+        assert users.document("del_b").to_dict()["matched_users"] == []
+        assert "liked_users.del_b" not in users.document("del_a").to_dict()
+        assert not like_ref("del_b", "del_a").get().exists
+    finally:
+        users._docs.pop("del_a")
+        users._docs.pop("del_b")
+
+
+def test_long_conversations_finish_deleting_in_the_background(mock_firestore, monkeypatch):
+    import services.firebase_service as firebase_service
+
+    monkeypatch.setattr(firebase_service, "DELETE_BATCH_SIZE", 2)
+    monkeypatch.setattr(firebase_service, "INLINE_DELETE_LIMIT", 4)
+    users, convo = _matched_pair(mock_firestore, messages=9)
+    try:
+        job = firebase_service.delete_conversation(convo.id)
+        assert job is not None
+        job.result(timeout=5)
+        assert convo.collection("messages").list_documents() == []
+        assert not convo.exists
+    finally:
+        users._docs.pop("del_a")
+        users._docs.pop("del_b")
+
+
+def test_unchanged_matches_are_not_sent_again(client):
+    first = client.get("/api/matches", headers={"Authorization": "Bearer user_1"})
+    assert first.status_code == 200 and first.headers["ETag"]
+
+    again = client.get("/api/matches", headers={"Authorization": "Bearer user_1", "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
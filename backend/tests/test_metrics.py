@@ -0,0 +1,69 @@
+# Per-request instrumentation and the /metrics endpoint
+
+import re
+
+from services.metrics import Histogram
+
+
+def _sample(client, name, route, method="GET"):
+    text = client.get("/metrics").get_data(as_text=True)
+    match = re.search(rf'^{name}{{route="{re.escape(route)}",method="{method}"}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_matches_reads_are_counted_once_each(client):
+    before = _sample(client, "rumble_request_firestore_reads_sum", "/api/matches")
+    count_before = _sample(client, "rumble_request_firestore_reads_count", "/api/matches")
+    rpcs_before = _sample(client, "rumble_request_firestore_rpcs_sum", "/api/matches")
+
+    assert client.get("/api/matches", headers={"Authorization": "Bearer user_1"}).status_code == 200
+
+    # The caller's document, then one batched read of their single match
+    assert _sample(client, "rumble_request_firestore_reads_sum", "/api/matches") - before == 2
+    assert _sample(client, "rumble_request_firestore_reads_count", "/api/matches") - count_before == 1
+    assert _sample(client, "rumble_request_firestore_rpcs_sum", "/api/matches") - rpcs_before == 2
+
+
+def test_writes_and_streamed_documents_are_counted(client, mock_firestore):
+    streamed_before = _sample(client, "rumble_request_firestore_streamed_documents_sum", "/api/suggested_users", "POST")
+    client.post("/api/suggested_users", json={}, headers={"Authorization": "Bearer user_3"})
+    # The suggestion index was rebuilt from every user document
+    users = len(list(mock_firestore.collection("users").stream()))
+    streamed = _sample(client, "rumble_request_firestore_streamed_documents_sum", "/api/suggested_users", "POST")
+    assert streamed - streamed_before >= users
+
+    writes_before = _sample(client, "rumble_request_firestore_writes_sum", "/api/swipe", "POST")
+    client.post("/api/swipe", json={"swipedID": "user_1"}, headers={"Authorization": "Bearer user_3"})
+    assert _sample(client, "rumble_request_firestore_writes_sum", "/api/swipe", "POST") - writes_before == 1
+    from services.firebase_service import like_ref
+    like_ref("user_3", "user_1").delete()
+
+
+def test_pool_cache_and_queue_gauges_are_exposed(client):
+    res = client.get("/metrics")
+    assert res.status_code == 200 and res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    for gauge in ("rumble_http_pool_connections_opened", "rumble_token_cache_hit_ratio",
+                  "rumble_profile_cache_memo_hits", "rumble_push_queue_depth"):
+        assert re.search(rf"^{gauge} \S+$", text, re.M), gauge
+
+
+def test_metrics_can_require_a_token(client, monkeypatch):
+    import routes.metrics_routes as metrics_routes
+
+    monkeypatch.setattr(metrics_routes, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("h", "Test.", (1, 5), ("route",))
+    for value in (0.5, 3, 9):
+        histogram.observe(value, "/r")
+    assert histogram.render()[2:] == [
+        'h_bucket{route="/r",le="1"} 1',
+        'h_bucket{route="/r",le="5"} 2',
+        'h_bucket{route="/r",le="+Inf"} 3',
+        'h_sum{route="/r"} 12.5',
+        'h_count{route="/r"} 3',
+    ]
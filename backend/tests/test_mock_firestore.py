@@ -0,0 +1,96 @@
+# The in-memory Firestore used by the tests and the load-test harness
+
+import time
+
+import pytest
+from google.api_core.exceptions import FailedPrecondition
+
+from mock_firebase import FieldFilter, MockFirestoreClient
+
+
+@pytest.fixture
+def db(monkeypatch):
+    import mock_firebase
+
+    # Queries and writes account their RPCs against the module-level client
+    fresh = MockFirestoreClient()
+    monkeypatch.setattr(mock_firebase, "mock_db", fresh)
+    people = fresh.collection("people")
+    for uid, age, tags, city in (("a", 20, ["x"], "nb"), ("b", 25, ["x", "y"], "nyc"),
+                                 ("c", 30, [], "nb"), ("d", 35, ["y"], None)):
+        data = {"age": age, "tags": tags, "home": {"city": city}}
+        if city is None:
+            del data["home"]
+        people.document(uid).set(data)
+    fresh.reset_stats()
+    return fresh
+
+
+def _ids(docs):
+    return [doc.id for doc in docs]
+
+
+def test_where_supports_firestore_operators(db):
+    people = db.collection("people")
+    assert _ids(people.where("age", ">=", 25).stream()) == ["b", "c", "d"]
+    assert _ids(people.where(filter=FieldFilter("tags", "array-contains", "y")).stream()) == ["b", "d"]
+    assert _ids(people.where("tags", "array-contains-any", ["x", "z"]).stream()) == ["a", "b"]
+    assert _ids(people.where("age", "in", [20, 35]).where("age", "!=", 35).stream()) == ["a"]
+    # Nested paths; documents missing the field never match, even for not-in
+    assert _ids(people.where("home.city", "not-in", ["nyc"]).stream()) == ["a", "c"]
+    with pytest.raises(ValueError):
+        people.where("age", "~", 1)
+
+
+def test_order_by_limit_and_start_after_page_through_results(db):
+    query = db.collection("people").order_by("age", direction="DESCENDING").limit(2)
+    first = query.stream()
+    assert _ids(first) == ["d", "c"]
+    assert _ids(query.start_after(first[-1]).stream()) == ["b", "a"]
+    assert _ids(query.start_after({"age": 25}).stream()) == ["a"]
+    # Ordering by a field leaves out documents without it
+    assert _ids(db.collection("people").order_by("home.city").stream()) == ["a", "c", "b"]
+
+
+def test_reads_and_rpcs_are_accounted(db):
+    people = db.collection("people")
+    people.document("a").get()
+    db.get_all([people.document(uid) for uid in "abc"])
+    people.where("age", ">", 99).stream()  # billed one read though nothing matches
+    batch = db.batch()
+    batch.set(people.document("e"), {"age": 1})
+    batch.delete(people.document("a"))
+    batch.commit()
+
+    assert db.stats() == {
+        "rpcs": 4,
+        "byMethod": {"get": 1, "batch_get": 1, "run_query": 1, "commit": 1},
+        "documentsRead": 5,
+        "documentsWritten": 2,
+    }
+
+
+def test_transactions_read_and_commit_with_preconditions(db):
+    ref = db.collection("people").document("a")
+    stale = ref.update_time
+    ref.update({"age": 21})
+
+    transaction = db.transaction()
+    assert transaction.get(ref)[0].to_dict()["age"] == 21
+    transaction.update(ref, {"age": 22}, option=db.write_option(last_update_time=stale))
+    with pytest.raises(FailedPrecondition):
+        transaction.commit()
+    assert ref.to_dict()["age"] == 21
+
+
+def test_latency_is_added_per_rpc_and_per_document(db):
+    db.latency, db.latency_per_document = 0.02, 0.01
+    start = time.perf_counter()
+    db.get_all([db.collection("people").document(uid) for uid in "abc"])
+    assert time.perf_counter() - start >= 0.05
+
+
+def test_select_and_read_masks_project_fields(db):
+    [doc] = db.collection("people").where("age", "==", 20).select(["home.city"]).stream()
+    assert doc.to_dict() == {"home": {"city": "nb"}}
+    assert db.get_all([db.collection("people").document("b")], field_paths=["age"])[0].to_dict() == {"age": 25}
@@ -35,7 +35,6 @@ def _seed_user(db, uid="test_user"):
                     "userType": "mentee",
                     "mentorshipAreas": [],
                 },
-                "liked_users": {},
                 "matched_users": [],
             }
         )
@@ -194,3 +193,124 @@ def test_T065_delete_account(client, mock_firestore):
     # Profile should now be gone
     prof_resp = client.get("/api/profile", headers=_auth_header(uid))
     assert prof_resp.status_code == HTTPStatus.NOT_FOUND
+
+# ---------------------------------------------------------------------------
+# Profile read-through cache
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def profile_reads(monkeypatch):
+    """Real profile service functions, with every Firestore read of a user recorded."""
+    monkeypatch.undo()
+    import services.firebase_service as firebase_service
+    import routes.user_routes as user_routes
+    import mock_firebase
+
+    monkeypatch.setattr(user_routes, "verify_token", mock_firebase.verify_token)
+    monkeypatch.setattr(user_routes, "schedule_queue_refresh", lambda uid: None)
+    reads = []
+    real_read = firebase_service._read_user_document
+    monkeypatch.setattr(firebase_service, "_read_user_document", lambda uid: reads.append(uid) or real_read(uid))
+    firebase_service.profile_cache.clear()
+    return reads
+
+
+def test_profile_reads_are_cached_until_written(client, mock_firestore, profile_reads):
+    import services.firebase_service as firebase_service
+    uid = _seed_user(mock_firestore, "cached_user")
+    hits_before = firebase_service.profile_cache.hits
+
+    for _ in range(3):
+        assert client.get("/api/profile", headers=_auth_header(uid)).status_code == HTTPStatus.OK
+    assert profile_reads == [uid]
+    assert firebase_service.profile_cache.hits == hits_before + 2
+
+    payload = {
+        "firstName": "Fresh", "lastName": "Name", "email": "student@rutgers.edu",
+        "birthday": "2000-01-01", "ethnicity": "Asian", "gender": "Female", "pronouns": "she/her",
+    }
+    client.put("/api/update_settings", json=payload, headers=_auth_header(uid))
+    assert client.get("/api/profile", headers=_auth_header(uid)).get_json()["settings"]["firstName"] == "Fresh"
+    assert profile_reads == [uid, uid]
+    mock_firestore.collection("users").document(uid).delete()
+
+
+def test_profile_is_read_once_per_request(client, mock_firestore, profile_reads):
+    import services.firebase_service as firebase_service
+    uid = _seed_user(mock_firestore, "memo_user")
+
+    with client.application.test_request_context():
+        first = firebase_service.get_user_profile(uid)
+        firebase_service.profile_cache.clear()
+        assert firebase_service.get_user_profile(uid) is first
+        assert firebase_service.get_user_profile(uid, fresh=True) is first
+    assert profile_reads == [uid]
+    assert firebase_service.profile_cache_stats()["memoHits"] >= 2
+    mock_firestore.collection("users").document(uid).delete()
+
+
+# ---------------------------------------------------------------------------
+# Write responses, field projection and conditional writes
+# ---------------------------------------------------------------------------
+
+_PROFILE_PAYLOAD = {
+    "bio": "Updated", "profilePictureUrl": "", "major": "Physics", "gradYear": 2026,
+    "hobbies": [], "orgs": [], "careerPath": "Researcher", "interestedIndustries": [],
+    "userType": "mentee", "mentorshipAreas": [],
+}
+
+
+def test_update_responds_from_the_write_without_reading_back(client, mock_firestore, profile_reads):
+    uid = _seed_user(mock_firestore, "writer_user")
+
+    resp = client.put("/api/update_profile", json=_PROFILE_PAYLOAD, headers=_auth_header(uid))
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.get_json() == {"profile": _PROFILE_PAYLOAD}
+    assert resp.headers["ETag"]
+    assert profile_reads == []
+
+    resp = client.put("/api/update_profile?fields=profile.major,profile.gradYear",
+                      json=_PROFILE_PAYLOAD, headers=_auth_header(uid))
+    assert resp.get_json() == {"profile": {"major": "Physics", "gradYear": 2026}}
+    mock_firestore.collection("users").document(uid).delete()
+
+
+def test_if_match_rejects_writes_over_newer_versions(client, mock_firestore, profile_reads):
+    uid = _seed_user(mock_firestore, "conditional_user")
+    first = client.put("/api/update_profile", json=_PROFILE_PAYLOAD, headers=_auth_header(uid))
+    version = first.headers["ETag"]
+
+    # Someone else edits the settings in between
+    settings = dict(mock_firestore.collection("users").document(uid).to_dict()["settings"], firstName="Other")
+    other = client.put("/api/update_settings", json=settings, headers=_auth_header(uid))
+    assert other.status_code == HTTPStatus.OK and other.headers["ETag"] != version
+
+    stale = client.put("/api/update_profile", json=dict(_PROFILE_PAYLOAD, major="Stale"),
+                       headers={**_auth_header(uid), "If-Match": version})
+    assert stale.status_code == HTTPStatus.PRECONDITION_FAILED
+    assert mock_firestore.collection("users").document(uid).to_dict()["profile"]["major"] == "Physics"
+
+    stale = client.put("/api/update_settings", json=settings, headers={**_auth_header(uid), "If-Match": version})
+    assert stale.status_code == HTTPStatus.PRECONDITION_FAILED
+
+    current = client.put("/api/update_profile", json=dict(_PROFILE_PAYLOAD, major="Current"),
+                         headers={**_auth_header(uid), "If-Match": other.headers["ETag"]})
+    assert current.status_code == HTTPStatus.OK
+    assert mock_firestore.collection("users").document(uid).to_dict()["profile"]["major"] == "Current"
+    mock_firestore.collection("users").document(uid).delete()
+
+
+def test_unchanged_profile_is_not_sent_again(client, mock_firestore, profile_reads):
+    uid = _seed_user(mock_firestore, "etag_user")
+    first = client.get("/api/profile", headers=_auth_header(uid))
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/profile", headers={**_auth_header(uid), "If-None-Match": etag})
+    assert again.status_code == HTTPStatus.NOT_MODIFIED
+    assert again.data == b"" and again.headers["ETag"] == etag
+    assert profile_reads == [uid]  # answered from the cached version
+
+    client.put("/api/update_profile", json=_PROFILE_PAYLOAD, headers=_auth_header(uid))
+    changed = client.get("/api/profile", headers={**_auth_header(uid), "If-None-Match": etag})
+    assert changed.status_code == HTTPStatus.OK and changed.headers["ETag"] != etag
+    mock_firestore.collection("users").document(uid).delete()
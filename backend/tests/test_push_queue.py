@@ -0,0 +1,97 @@
+# Background push delivery against a local stub of the Expo push API
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.firebase_service import build_push_message, http_pool_stats
+from services.push_queue import PushQueue
+
+
+@pytest.fixture
+def expo_stub():
+    """Local HTTP server standing in for exp.host; records every request body."""
+    received = []
+    responses = []  # status codes to return, in order; 200 once exhausted
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like exp.host
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            received.append(body)
+            status = responses.pop(0) if responses else 200
+            payload = {"data": [{"status": "ok", "id": f"ticket_{i}"} for i in range(len(body))]}
+            out = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/push/send", received, responses
+    server.shutdown()
+
+
+def test_pending_notifications_are_batched(expo_stub):
+    url, received, _ = expo_stub
+    queue = PushQueue(url=url, autostart=False)
+    for i in range(3):
+        queue.enqueue(build_push_message(f"token_{i}", "RUmble", f"hello {i}"))
+    assert queue.metrics()["depth"] == 3
+
+    queue.start()
+    assert queue.flush(timeout=5)
+
+    assert len(received) == 1
+    assert [m["to"] for m in received[0]] == ["token_0", "token_1", "token_2"]
+    metrics = queue.metrics()
+    assert metrics["depth"] == 0 and metrics["sent"] == 3 and metrics["batches"] == 1
+
+
+def test_server_errors_are_retried(expo_stub):
+    url, received, responses = expo_stub
+    responses.extend([503, 500])
+    queue = PushQueue(url=url, backoff=0.01)
+    queue.enqueue(build_push_message("token_x", "RUmble", "retry me"))
+    assert queue.flush(timeout=5)
+
+    assert len(received) == 3
+    metrics = queue.metrics()
+    assert metrics["retries"] == 2 and metrics["sent"] == 1 and metrics["failed"] == 0
+
+
+def test_connections_are_reused_across_batches(expo_stub):
+    url, received, _ = expo_stub
+    before = http_pool_stats()
+    queue = PushQueue(url=url)
+    for i in range(3):
+        queue.enqueue(build_push_message(f"token_{i}", "RUmble", "ping"))
+        assert queue.flush(timeout=5)
+
+    after = http_pool_stats()
+    assert len(received) == 3
+    assert after["connectionsOpened"] - before["connectionsOpened"] == 1
+    assert after["connectionsReused"] - before["connectionsReused"] == 2
+
+
+@pytest.mark.parametrize("payload", [[{"status": "ok"}], {"data": "oops"}, {"data": ["ok", {"status": "error"}]}])
+def test_unexpected_response_bodies_are_counted_once(payload):
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return payload
+
+    queue = PushQueue(autostart=False)
+    queue._record_result([{}, {}], Response())
+    metrics = queue.metrics()
+    assert metrics["batches"] == 1 and metrics["sent"] + metrics["failed"] == 2
@@ -0,0 +1,23 @@
+# Sync/async serving switch in app.create_app
+
+import pytest
+
+from app import create_app
+
+
+def test_sync_mode_is_the_default(monkeypatch):
+    monkeypatch.delenv("SERVING_MODE", raising=False)
+    assert create_app(testing=True).config["SERVING_MODE"] == "sync"
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        create_app(testing=True, serving_mode="threads")
+
+
+def test_async_mode_refuses_to_start_without_gevent_workers(monkeypatch):
+    # Outside a gevent worker the standard library is unpatched, so blocking
+    # calls would stall every request in the process
+    monkeypatch.setenv("SERVING_MODE", "async")
+    with pytest.raises(RuntimeError):
+        create_app(testing=True)
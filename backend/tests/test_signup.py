@@ -113,3 +113,60 @@ def test_T009_all_fields_missing(client):
     resp = client.post("/api/create_user", json={"email": "", "password": ""})
     assert resp.status_code == HTTPStatus.BAD_REQUEST
     assert "Email and password are required" in resp.get_json().get("error", "")
+
+
+# ---------------------------------------------------------------------------
+# Email reservations
+# ---------------------------------------------------------------------------
+
+def test_duplicate_check_reads_one_reservation_not_every_user(client, mock_firestore, monkeypatch):
+    users = mock_firestore.collection("users")
+    monkeypatch.setattr(users, "stream", lambda: pytest.fail("signup must not scan users"))
+
+    assert _create_user(client, email="unique@rutgers.edu").status_code == HTTPStatus.CREATED
+    dup = _create_user(client, email=" Unique@Rutgers.edu ")
+    assert dup.status_code == HTTPStatus.BAD_REQUEST
+    assert dup.get_json()["error"] == "Email already in use"
+
+
+def test_reservation_is_atomic_with_the_user_document(mock_firestore, monkeypatch):
+    """A signup that loses the race for an address writes nothing and drops its auth user."""
+    monkeypatch.undo()  # exercise the real service functions
+    import services.firebase_service as firebase_service
+
+    deleted = []
+    monkeypatch.setattr(firebase_service.auth, "delete_user", deleted.append)
+    profile = {"settings": {"email": "race@rutgers.edu"}, "profile": {}}
+
+    first = firebase_service.create_user_in_firebase("race@rutgers.edu", "secret1", profile)
+    assert first["user_id"]
+    monkeypatch.setattr(firebase_service.auth, "create_user", lambda **kw: type("U", (), {"uid": "racer_2"})())
+    second = firebase_service.create_user_in_firebase("race@rutgers.edu", "secret1", profile)
+    assert second == {"error": "Email already in use"}
+    assert deleted == ["racer_2"]
+    assert not mock_firestore.collection("users").document("racer_2").exists
+
+
+def test_settings_and_deletion_keep_reservations_in_step(mock_firestore, monkeypatch):
+    monkeypatch.undo()
+    import services.firebase_service as firebase_service
+
+    uid = firebase_service.create_user_in_firebase(
+        "mover@rutgers.edu", "secret1", {"settings": {"email": "mover@rutgers.edu"}, "profile": {}}
+    )["user_id"]
+    firebase_service.create_user_in_firebase(
+        "taken@rutgers.edu", "secret1", {"settings": {"email": "taken@rutgers.edu"}, "profile": {}}
+    )
+
+    assert not firebase_service.update_user_settings(uid, {"email": "taken@rutgers.edu"})
+    assert firebase_service.update_user_settings(uid, {"email": "moved@rutgers.edu"})
+    assert firebase_service.is_email_registered("moved@rutgers.edu")
+    assert not firebase_service.is_email_registered("mover@rutgers.edu")
+
+    for liker, likee in ((uid, "user_1"), ("user_2", uid)):
+        firebase_service.like_ref(liker, likee).set(firebase_service.like_edge(liker, likee))
+    firebase_service.delete_user_account(uid)
+    assert not firebase_service.is_email_registered("moved@rutgers.edu")
+    # Likes given and received go with the account
+    assert not firebase_service.like_ref(uid, "user_1").get().exists
+    assert not firebase_service.like_ref("user_2", uid).get().exists
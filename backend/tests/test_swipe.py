@@ -30,27 +30,25 @@ def test_swipe_success(client, mock_firestore):
     # Assert
     assert response.status_code == 200
 
-    # Verify that the swiped user ID was added to the swiping user's liked_users via Firestore field update
-    swiping_user_data = mock_firestore.collection("users") \
-                                  .document(swiping_user_id) \
-                                  .get() \
-                                  .to_dict()
-    field_key = f"liked_users.{swiped_user_id}"
-    assert field_key in swiping_user_data
-    assert swiping_user_data[field_key] is True
+    # Verify that a like edge from the swiping user to the swiped user was stored
+    from services.firebase_service import like_ref
+    edge = like_ref(swiping_user_id, swiped_user_id)
+    try:
+        edge_data = edge.get().to_dict()
+        assert edge_data["liker"] == swiping_user_id
+        assert edge_data["likee"] == swiped_user_id
+    finally:
+        edge.delete()
 
 # Test case T074
 def test_swipe_match_creates_match_and_conversation(client, mock_firestore):
     # Arrange: define user IDs
     swiping_user_id = "user_3"
     swiped_user_id = "user_1"
-    from services.firebase_service import get_convo_id
+    from services.firebase_service import get_convo_id, like_edge, like_ref
 
     # Simulate that user_1 has previously liked user_3
-    mock_firestore.collection("users").document(swiped_user_id).set(
-        {"liked_users": {swiping_user_id: True}},
-        merge=True
-    )
+    like_ref(swiped_user_id, swiping_user_id).set(like_edge(swiped_user_id, swiping_user_id))
 
     # Act: user_3 swipes right on user_1
     response = client.post(
@@ -72,3 +70,79 @@ def test_swipe_match_creates_match_and_conversation(client, mock_firestore):
     convo_id = get_convo_id(swiping_user_id, swiped_user_id)
     convo_doc = mock_firestore.collection("conversations").document(convo_id).get()
     assert convo_doc.exists
+
+
+def test_mutual_swipe_is_one_read_and_one_commit(client, mock_firestore, monkeypatch):
+    """Both like edges are read with one get_all and every write lands in one transaction commit."""
+    from services.firebase_service import like_edge, like_ref
+
+    users = mock_firestore.collection("users")
+    users.document("swipe_a").set({"uid": "swipe_a", "notification_token": "tok"})
+    users.document("swipe_b").set({"uid": "swipe_b"})
+    like_ref("swipe_a", "swipe_b").set(like_edge("swipe_a", "swipe_b"))
+
+    transactions = []
+    real_transaction = mock_firestore.transaction
+    monkeypatch.setattr(mock_firestore, "transaction", lambda: transactions.append(real_transaction()) or transactions[-1])
+    reads_before = getattr(mock_firestore, "get_all_calls", 0)
+    try:
+        res = client.post("/api/swipe", json={"swipedID": "swipe_a"}, headers={"Authorization": "Bearer swipe_b"})
+        assert res.get_json() == {"match": True, "notified": True}
+        assert mock_firestore.get_all_calls - reads_before == 1
+        assert len(transactions) == 1 and transactions[0].committed
+        assert len(transactions[0]._writes) == 5
+        assert users.document("swipe_b").to_dict()["matched_users"] == ["swipe_a"]
+        # Neither like is pending any more
+        assert like_ref("swipe_b", "swipe_a").get().to_dict()["matched"] is True
+        assert like_ref("swipe_a", "swipe_b").get().to_dict()["matched"] is True
+    finally:
+        users._docs.pop("swipe_a")
+        users._docs.pop("swipe_b")
+        like_ref("swipe_a", "swipe_b").delete()
+        like_ref("swipe_b", "swipe_a").delete()
+
+
+def test_migrate_liked_users_moves_maps_to_like_edges(mock_firestore):
+    """Legacy liked_users maps become like edges, and a second run finds nothing left."""
+    from services.firebase_service import get_excluded_ids, like_ref, migrate_liked_users
+
+    users = mock_firestore.collection("users")
+    users.document("legacy_a").set({"uid": "legacy_a", "liked_users": {"legacy_b": True, "user_1": True}})
+    users.document("legacy_b").set({"uid": "legacy_b", "liked_users": {}})
+    try:
+        assert migrate_liked_users() == 2
+        assert like_ref("legacy_a", "legacy_b").get().exists and like_ref("legacy_a", "user_1").get().exists
+        assert "liked_users" not in users.document("legacy_a").to_dict()
+        assert "liked_users" not in users.document("legacy_b").to_dict()
+        assert {"legacy_b", "user_1"} <= get_excluded_ids("legacy_a")
+        assert migrate_liked_users() == 0
+    finally:
+        users._docs.pop("legacy_a")
+        users._docs.pop("legacy_b")
+        like_ref("legacy_a", "legacy_b").delete()
+        like_ref("legacy_a", "user_1").delete()
+
+
+def test_liked_me_pages_through_pending_likes(client):
+    """Incoming likes come newest first, a page at a time, leaving out the ones that became matches."""
+    from datetime import datetime, timezone
+    from services.firebase_service import like_ref
+
+    likes = [("user_1", 1, False), ("user_2", 2, False), ("user_3", 3, True)]
+    for liker, day, matched in likes:
+        like_ref(liker, "liked_me").set({"liker": liker, "likee": "liked_me", "matched": matched,
+                                         "createdAt": datetime(2025, 1, day, tzinfo=timezone.utc)})
+    headers = {"Authorization": "Bearer liked_me"}
+    try:
+        first = client.get("/api/liked_me?limit=1", headers=headers).get_json()
+        assert [u["id"] for u in first["users"]] == ["user_2"] and first["nextAfter"] == "user_2"
+        assert first["users"][0]["likedAt"].startswith("2025-01-02")
+
+        second = client.get("/api/liked_me?limit=1&after=user_2", headers=headers).get_json()
+        assert [u["id"] for u in second["users"]] == ["user_1"] and second["nextAfter"] is None
+
+        assert client.get("/api/liked_me?after=nobody", headers=headers).status_code == 400
+        assert client.get("/api/liked_me?limit=0", headers=headers).status_code == 400
+    finally:
+        for liker, _, _ in likes:
+            like_ref(liker, "liked_me").delete()
@@ -0,0 +1,111 @@
+# Process-local replica of the users collection
+
+import pytest
+
+from services.firebase_service import (
+    LIKES_COLLECTION, SUMMARY_FIELDS, get_excluded_ids, is_email_registered, like_edge, like_ref
+)
+from services.suggestion_index import LIKED_YOU_POINTS, suggestion_index
+from services.user_replica import REPLICA_FIELDS, UserReplica, user_replica
+
+
+@pytest.fixture
+def replica(mock_firestore):
+    user_replica.start(mock_firestore.collection("users"), mock_firestore.collection(LIKES_COLLECTION))
+    yield user_replica
+    user_replica.stop()
+
+
+def test_replica_covers_the_summary_fields():
+    assert set(SUMMARY_FIELDS) <= set(REPLICA_FIELDS)
+
+
+def test_replica_loads_and_follows_the_collection(replica, mock_firestore):
+    assert replica.ready and len(replica) == len(mock_firestore.collection("users").stream())
+    alice = replica.get("user_1")
+    assert alice["settings"]["firstName"] == "Alice" and alice["profile"]["hobbies"] == ["Hiking", "Reading"]
+    stored = mock_firestore.collection("users").document("user_1").to_dict()
+    assert alice["liked_users"].get("user_2") is True and alice["matched_users"] == stored["matched_users"]
+    assert "notification_token" not in alice and "profilePictureUrl" not in alice["profile"]
+
+    users = mock_firestore.collection("users")
+    users.document("replica_new").set({"profile": {"userType": "mentor", "major": "Replicas"},
+                                       "settings": {"email": "New@Rutgers.edu"}})
+    try:
+        assert replica.get("replica_new")["profile"]["major"] == "Replicas"
+        assert replica.has_email(" new@rutgers.edu")
+        # Changes reach the suggestion index too
+        assert "replica_new" in suggestion_index.match_ids({"major": "Replicas"})
+    finally:
+        users.document("replica_new").delete()
+    assert replica.get("replica_new") is None and not replica.has_email("new@rutgers.edu")
+    assert replica.stats()["events"] == len(replica) + replica.stats()["likes"] + 2
+
+
+def test_replica_follows_like_edges(replica):
+    assert replica.liked_ids("user_2") == ["user_1"]
+    likes = replica.stats()["likes"]
+    like = like_ref("user_2", "user_3")
+    like.set(like_edge("user_2", "user_3"))
+    try:
+        assert replica.liked_ids("user_2") == ["user_1", "user_3"]
+        assert replica.stats()["likes"] == likes + 1
+    finally:
+        like.delete()
+    assert replica.liked_ids("user_2") == ["user_1"] and replica.stats()["likes"] == likes
+
+
+def test_suggestions_and_email_check_make_no_firestore_calls(client, replica, mock_firestore):
+    mock_firestore.reset_stats()
+    headers = {"Authorization": "Bearer user_3"}
+
+    filtered = client.post("/api/suggested_users", json={"userType": "mentee"}, headers=headers)
+    ranked = client.post("/api/suggested_users", json={"rank": True, "hobbies": ["Gaming"]}, headers=headers)
+    mentees = {uid for uid, data in mock_firestore.collection("users")._docs.items()
+               if data.exists and data.to_dict().get("profile", {}).get("userType") == "mentee"}
+    assert "user_2" in {u["id"] for u in filtered.get_json()["users"]} <= mentees
+    top = ranked.get_json()["users"][0]
+    assert top["id"] == "user_2" and top["bio"] == "Passionate about building things!"
+
+    assert is_email_registered("ALICE@example.com") and not is_email_registered("nobody@rutgers.edu")
+    assert mock_firestore.stats()["rpcs"] == 0
+
+
+def test_users_who_liked_you_rank_first_without_reads(client, replica, mock_firestore):
+    like = like_ref("user_2", "user_3")
+    like.set(like_edge("user_2", "user_3"))
+    try:
+        assert "user_2" in replica.liked_by_ids("user_3")
+        mock_firestore.reset_stats()
+        res = client.post("/api/suggested_users", json={"rank": True, "major": "Computer Science"},
+                          headers={"Authorization": "Bearer user_3"})
+        top = res.get_json()["users"][0]
+        assert top["id"] == "user_2" and top["scoreBreakdown"]["likedYou"] == LIKED_YOU_POINTS
+        assert mock_firestore.stats()["rpcs"] == 0
+    finally:
+        like.delete()
+    assert "user_2" not in replica.liked_by_ids("user_3")
+
+
+def test_own_likes_apply_before_the_listener_catches_up(replica):
+    replica.note_like("user_3", "user_1")
+    assert "user_1" in get_excluded_ids("user_3")
+
+    replica.note_like("user_3", "user_2", matched=True)
+    assert "user_3" in replica.get("user_2")["matched_users"]
+    replica.note_unmatch("user_3", "user_2")
+    assert "user_2" not in get_excluded_ids("user_3") and "user_3" not in replica.get("user_2")["matched_users"]
+
+
+def test_replica_over_its_memory_cap_falls_back_to_firestore(mock_firestore):
+    small = UserReplica(max_bytes=1000)
+    small.start(mock_firestore.collection("users"))
+    assert not small.ready and small.overflowed and len(small) == 0
+    assert small.stats()["overflowed"] == 1
+    assert mock_firestore.collection("users")._listeners == []
+
+
+def test_replica_gauges_are_exposed(client, replica):
+    text = client.get("/metrics").get_data(as_text=True)
+    assert f"rumble_user_replica_users {len(replica)}" in text
+    assert "rumble_user_replica_staleness_seconds" in text